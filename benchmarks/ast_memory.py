@@ -0,0 +1,43 @@
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lang.parser import Parser
+from lang.tokenizer import Tokenizer
+
+def generate_program(functions):
+    program = ["package main;", ""]
+    for index in range(functions):
+        program.append(f"integer compute{index}(integer left, integer right) {{")
+        program.append(f"    var integer total = left * {index} + right - getOffset(left, right);")
+        program.append(f"    if total >= 10 && total != left || right < 3 {{ total -= 1; }}")
+        program.append(f"    while total > 0 {{ total = total - compute{index}(left, right - 1); }}")
+        program.append(f'    print("total is", total, left, right);')
+        program.append("    return total;")
+        program.append("}")
+    program.append("void main() { print(compute0(1, 2)); }")
+    return "\n".join(program)
+
+def main(functions=20_000):
+    beezus_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(beezus_home, "lang", "token.g")) as grammar_file:
+        grammar = grammar_file.read()
+    program = generate_program(functions)
+    tokenizer = Tokenizer(grammar)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tree = Parser(tokenizer, beezus_home, beezus_home, program, dict()).parse()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"{functions} functions ({len(program.encode()) / 2**20:.1f} MiB source): "
+          f"AST retains {retained / 2**20:.1f} MiB")
+    return tree
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
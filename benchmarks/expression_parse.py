@@ -0,0 +1,40 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lang.parser import Parser
+from lang.tokenizer import Tokenizer
+
+def generate_program(functions, chain=24):
+    # rule110 style && chains plus mixed precedence arithmetic
+    program = ["package main;", ""]
+    for index in range(functions):
+        test = " && ".join(f"v{term % 3} == {term % 2}" for term in range(chain))
+        arithmetic = " + ".join(f"v0 * {term} - v1 / 2 < v2 || !v{term % 3} != -v1" for term in range(chain // 4))
+        program.append(f"integer pattern{index}(integer v0, integer v1, integer v2) {{")
+        program.append(f"    if {test} {{ return 1; }} else if {arithmetic} {{ return 2; }}")
+        program.append("    return 0;")
+        program.append("}")
+    program.append("void main() { }")
+    return "\n".join(program)
+
+def main(functions=5_000, repeat=3):
+    beezus_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(beezus_home, "lang", "token.g")) as grammar_file:
+        grammar = grammar_file.read()
+    program = generate_program(functions)
+    tokenizer = Tokenizer(grammar)
+    tokens = tokenizer.tokenize(program)
+    best = None
+    for _ in range(repeat):
+        parser = Parser(tokenizer, beezus_home, beezus_home, program, dict())
+        started = time.perf_counter()
+        parser.parse()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"parsed {functions} functions ({len(tokens)} tokens) in {best:.3f}s (excluding tokenization)")
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import random
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lang.parser import Parser
+from lang.tokenizer import Tokenizer
+from lang.compiler import Compiler
+from lang.passes.specialize import BuiltinSpecializer
+
+# reads a count and that many integers, echoes every one with a running total
+PROGRAM = "\n".join([
+    "package main;",
+    "",
+    "void main() {",
+    "    var integer count = int(input());",
+    "    var integer total = 0;",
+    "    var integer index = 0;",
+    "    while index < count {",
+    "        var integer value = int(input());",
+    "        total += value;",
+    "        print(value, total);",
+    "        index += 1;",
+    "    }",
+    "}"
+])
+
+def build(beezus_home, grammar, specialize, build_home):
+    parser = Parser(Tokenizer(grammar), beezus_home, beezus_home, PROGRAM, dict())
+    tree = parser.parse()
+    for declaration in tree['body']:
+        parser.parse_body(declaration)
+    if specialize:
+        BuiltinSpecializer(tree).run()
+    go_path = os.path.join(build_home, f"specialize_{specialize}.go")
+    with open(go_path, "w") as go_file:
+        go_file.write(Compiler(tree).compile())
+    binary_path = go_path[:-3]
+    subprocess.run(["go", "build", "-o", binary_path, go_path], check=True)
+    return binary_path
+
+def main(lines=1_000_000, repeat=3):
+    beezus_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(beezus_home, "lang", "token.g")) as grammar_file:
+        grammar = grammar_file.read()
+    generator = random.Random(110)
+    values = [str(generator.randint(-10**9, 10**9)) for _ in range(lines)]
+    with tempfile.TemporaryDirectory() as build_home:
+        input_path = os.path.join(build_home, "input.txt")
+        with open(input_path, "w") as input_file:
+            input_file.write("\n".join([str(lines)] + values) + "\n")
+        size = os.path.getsize(input_path) / 1e6
+        for specialize in (False, True):
+            binary_path = build(beezus_home, grammar, specialize, build_home)
+            best = None
+            for _ in range(repeat):
+                with open(input_path) as input_file:
+                    started = time.perf_counter()
+                    subprocess.run([binary_path], stdin=input_file, stdout=subprocess.DEVNULL, check=True)
+                    elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            label = "inputInt/typed" if specialize else "input/print"
+            print(f"{label:>15}: {lines} lines in {best:.3f}s, "
+                  f"{lines / best / 1e6:.2f}M lines/s, {size / best:.1f}MB/s in")
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
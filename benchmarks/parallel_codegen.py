@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lang.parser import Parser
+from lang.tokenizer import Tokenizer
+from lang.compiler import Compiler
+
+def generate_program(functions):
+    # a chain of small functions, the shape code generators tend to emit
+    lines = ["package main;", "", "void main() {", "    print(f0(1));", "}"]
+    for index in range(functions):
+        callee = f"f{index + 1}(x - 1)" if index + 1 < functions else "x"
+        lines.extend([
+            "",
+            f"integer f{index}(integer x) {{",
+            "    var integer total = 0;",
+            "    var integer step = 0;",
+            "    while step < 4 {",
+            "        if step < 2 {",
+            "            total += x * step + 1;",
+            "        } else {",
+            "            total -= x / 3 - step;",
+            "        }",
+            "        step += 1;",
+            "    }",
+            f"    return total + {callee};",
+            "}"
+        ])
+    return "\n".join(lines)
+
+def main(functions=5_000, jobs=os.cpu_count(), repeat=3):
+    beezus_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(beezus_home, "lang", "token.g")) as grammar_file:
+        grammar = grammar_file.read()
+    parser = Parser(Tokenizer(grammar), beezus_home, beezus_home, generate_program(functions), dict())
+    tree = parser.parse()
+    for declaration in tree['body']:
+        parser.parse_body(declaration)
+    outputs = dict()
+    for label, compiler_jobs in (("serial", 1), (f"{jobs} job(s)", jobs)):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            outputs[label] = Compiler(tree, compiler_jobs).compile()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{label:>10}: generated {functions} functions in {best:.3f}s")
+    print("identical output:", len(set(outputs.values())) == 1)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
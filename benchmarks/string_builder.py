@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lang.parser import Parser
+from lang.tokenizer import Tokenizer
+from lang.compiler import Compiler
+from lang.passes.builders import StringBuilders
+
+def generate_program(iterations):
+    # a report built line by line, the way larger outputs are usually made
+    return "\n".join([
+        "package main;",
+        "",
+        "void main() {",
+        '    var string output = "";',
+        "    var integer row = 0;",
+        f"    while row < {iterations} {{",
+        '        output += "row ";',
+        '        output = output + "0123456789" + "\\n";',
+        "        row += 1;",
+        "    }",
+        "    print(output);",
+        "}"
+    ])
+
+def build(beezus_home, grammar, program, builders, build_home):
+    parser = Parser(Tokenizer(grammar), beezus_home, beezus_home, program, dict())
+    tree = parser.parse()
+    for declaration in tree['body']:
+        parser.parse_body(declaration)
+    if builders:
+        StringBuilders(tree).run()
+    go_path = os.path.join(build_home, f"builders_{builders}.go")
+    with open(go_path, "w") as go_file:
+        go_file.write(Compiler(tree).compile())
+    binary_path = go_path[:-3]
+    subprocess.run(["go", "build", "-o", binary_path, go_path], check=True)
+    return binary_path
+
+def main(iterations=20_000, repeat=3):
+    beezus_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(beezus_home, "lang", "token.g")) as grammar_file:
+        grammar = grammar_file.read()
+    program = generate_program(iterations)
+    with tempfile.TemporaryDirectory() as build_home:
+        for builders in (False, True):
+            binary_path = build(beezus_home, grammar, program, builders, build_home)
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                subprocess.run([binary_path], stdout=subprocess.DEVNULL, check=True)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            label = "strings.Builder" if builders else "string +"
+            print(f"{label:>15}: built {iterations} rows in {best:.3f}s")
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
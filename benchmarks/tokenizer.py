@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lang.tokenizer import Tokenizer
+from lang.utils.source import open_source
+from lang.utils.generator import StreamGenerator
+
+def generate_program(lines):
+    program = ["package main;", "", "void main() {"]
+    for index in range((lines - 4) // 3):
+        program.append(f"    var integer value{index} = getNumber() + {index} * 2;")
+        program.append(f'    print("value is", value{index}); // trailing comment')
+        program.append(f"    if value{index} >= 10 && value{index} != 3 {{ value{index} -= 1; }}")
+    program.append("}")
+    return "\n".join(program)
+
+def main(lines=100_000, repeat=3):
+    beezus_home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(beezus_home, "lang", "token.g")) as grammar_file:
+        grammar = grammar_file.read()
+    program = generate_program(lines)
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        tokens = Tokenizer(grammar).tokenize(program)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"tokenized {lines} lines into {len(tokens)} tokens in {best:.3f}s")
+    del tokens
+
+    with tempfile.NamedTemporaryFile("w", suffix=".bz", delete=False) as program_file:
+        program_file.write(program)
+    try:
+        tracemalloc.start()
+        with open(program_file.name) as source_file:
+            count = len(Tokenizer(grammar).tokenize(source_file.read()))
+        eager_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        with open_source(program_file.name) as source:
+            tokens = StreamGenerator(Tokenizer(grammar).stream(source))
+            while tokens.has_next():
+                tokens.next()
+        stream_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        os.remove(program_file.name)
+    print(f"source {len(program.encode()) / 2**20:.1f} MiB, {count} tokens, "
+          f"peak eager {eager_peak / 2**20:.1f} MiB, peak streaming {stream_peak / 2**20:.1f} MiB")
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,181 @@
+import gc
+import os
+import sys
+import json
+import pickle
+import hashlib
+
+CACHE_DIR_NAME = ".beezus_cache"
+
+def get_cache_home(beezus_home):
+    cache_home = os.environ.get("BEEZUS_CACHE")
+    if cache_home is None:
+        cache_home = os.path.join(beezus_home, CACHE_DIR_NAME)
+    return os.path.abspath(cache_home)
+
+def hash_file(path, digest=None):
+    digest = hashlib.sha256() if digest is None else digest
+    with open(path, "rb") as source_file:
+        for chunk in iter(lambda: source_file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest
+
+def compiler_fingerprint(beezus_home):
+    # Any change to the compiler itself must invalidate cached builds
+    digest = hashlib.sha256()
+    lang_home = os.path.join(beezus_home, "lang")
+    for root, dirs, files in os.walk(lang_home):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(".py"):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, lang_home).encode())
+                hash_file(path, digest)
+    return digest.hexdigest()
+
+def compiler_version(fingerprint, grammar):
+    # Parsed modules depend on the parser, the grammar and the pickle format
+    digest = hashlib.sha256(fingerprint.encode())
+    digest.update(grammar.encode())
+    digest.update(f"{sys.version_info[:2]}:{pickle.HIGHEST_PROTOCOL}".encode())
+    return digest.hexdigest()
+
+class BuildCache:
+    def __init__(self, cache_home, fingerprint, options=""):
+        # options are the compile flags that change the generated Go
+        self.cache_home = cache_home
+        self.fingerprint = fingerprint
+        self.options = options
+        self.bin_home = os.path.join(cache_home, "bin")
+        self.manifest_path = os.path.join(cache_home, "manifest.json")
+
+    def get_key(self, dependencies):
+        digest = hashlib.sha256(self.fingerprint.encode())
+        digest.update(self.options.encode())
+        for path in dependencies:
+            digest.update(os.path.abspath(path).encode())
+            hash_file(path, digest)
+        return digest.hexdigest()
+
+    def get_entry_name(self, entry_path):
+        entry_name = os.path.abspath(entry_path)
+        return entry_name if not self.options else f"{entry_name} [{self.options}]"
+
+    def get_binary_path(self, key):
+        return os.path.join(self.bin_home, key)
+
+    def lookup(self, entry_path):
+        entry = self.load_manifest().get(self.get_entry_name(entry_path))
+        if entry is None:
+            return None
+        if any(os.path.exists(path) for path in entry['missing']):
+            return None # a new module now shadows one of the resolved imports
+        if not all(os.path.exists(path) for path in entry['dependencies']):
+            return None
+        key = self.get_key(entry['dependencies'])
+        binary_path = self.get_binary_path(key)
+        if key != entry['key'] or not os.path.exists(binary_path):
+            return None
+        return binary_path
+
+    def store(self, entry_path, dependencies, missing, key):
+        manifest = self.load_manifest()
+        manifest[self.get_entry_name(entry_path)] = {
+            "key": key,
+            "dependencies": [os.path.abspath(path) for path in dependencies],
+            "missing": [os.path.abspath(path) for path in missing]
+        }
+        os.makedirs(self.cache_home, exist_ok=True)
+        temp_path = self.manifest_path + f".{os.getpid()}"
+        with open(temp_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path) as manifest_file:
+                return json.load(manifest_file)
+        except ValueError:
+            return {}
+
+class ModuleCache:
+    def __init__(self, cache_home, version):
+        self.module_home = os.path.join(cache_home, "modules")
+        self.version = version
+
+    def get_key(self, source):
+        digest = hashlib.sha256(self.version.encode())
+        digest.update(source)
+        return digest.hexdigest()
+
+    def get_module_path(self, key):
+        return os.path.join(self.module_home, key[:2], key + ".bzc")
+
+    def load(self, key):
+        data = self.read(key)
+        return None if data is None else self.loads(data)
+
+    def read(self, key):
+        try:
+            with open(self.get_module_path(key), "rb") as module_file:
+                return module_file.read()
+        except OSError:
+            return None
+
+    def loads(self, data):
+        # a module is thousands of small containers, the cyclic collector
+        # would otherwise run many times over a single load
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return pickle.loads(data)
+        except (EOFError, ValueError, TypeError, pickle.UnpicklingError):
+            return None
+        finally:
+            if gc_enabled: gc.enable()
+
+    def store(self, key, declarations):
+        self.write(key, pickle.dumps(declarations, pickle.HIGHEST_PROTOCOL))
+
+    def write(self, key, data):
+        module_path = self.get_module_path(key)
+        os.makedirs(os.path.dirname(module_path), exist_ok=True)
+        temp_path = module_path + f".{os.getpid()}"
+        with open(temp_path, "wb") as module_file:
+            module_file.write(data)
+        os.replace(temp_path, module_path)
+
+class SharedModuleCache(ModuleCache):
+    # Keeps every module a process parses or loads in memory for the next
+    # program it compiles, in front of the files of ModuleCache (skipped
+    # when persist is off). The modules stay pickled, the passes change the
+    # trees they are handed.
+    def __init__(self, cache_home, version, persist=True):
+        super().__init__(cache_home, version)
+        self.persist = persist
+        self.modules = dict() # key -> pickled declarations
+        self.used = set() # keys read or written since the last collect
+
+    def collect(self):
+        # drops the modules no program needed since the last call, older
+        # versions of edited modules in a long running process
+        for key in set(self.modules) - self.used:
+            del self.modules[key]
+        self.used = set()
+
+    def read(self, key):
+        self.used.add(key)
+        data = self.modules.get(key)
+        if data is None and self.persist:
+            data = super().read(key)
+            if data is not None:
+                self.modules[key] = data
+        return data
+
+    def write(self, key, data):
+        self.used.add(key)
+        self.modules[key] = data
+        if self.persist:
+            super().write(key, data)
@@ -1,93 +1,517 @@
-from lang.utils.ast_node import NodeType, get_default_type_mapping
+import io
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from lang.utils.ast_node import NodeType, Expression, walk, get_default_type_mapping, get_membership_name, \
+    get_element_type, get_callee_name
+from lang.expections import LoomSyntaxError
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "default.go")
+
+# Go's binary operator precedences, unary operators bind tighter than all of them
+PRECEDENCES = {
+    "||": 1,
+    "&&": 2,
+    "==": 3, "!=": 3, "<": 3, "<=": 3, ">": 3, ">=": 3,
+    "+": 4, "-": 4, "|": 4, "^": 4,
+    "*": 5, "/": 5, "%": 5, "<<": 5, ">>": 5, "&": 5, "&^": 5
+}
+UNARY_PRECEDENCE = 6
+HIGHEST_PRECEDENCE = 7
+
+# Operator followed by a character that would lex as a different token
+COMBINING = {"+": "+", "-": "-", "/": "*", "<": "-<", "&": "&^"}
+
+# Below this many functions the process pool costs more than it saves
+PARALLEL_THRESHOLD = 1000
+
+default_source = None # (mtime, text) of lang/default.go, read again only when it changes
+worker = None # the Compiler forked code generation workers inherit
+
+def compile_function_sources(start, stop):
+    # runs in a forked worker process, the Go text of a range of the
+    # functions and what each of them spawns
+    sources = list()
+    for function in worker.pending[start:stop]:
+        worker.spawned = list()
+        with io.StringIO() as buffer:
+            worker.writer = GoWriter(buffer)
+            worker.compile_function(function)
+            sources.append((buffer.getvalue(), worker.spawned))
+    return sources
+
+class GoWriter:
+    # Writes Go source to stream one line at a time, indented with tabs the
+    # way gofmt indents it
+    def __init__(self, stream):
+        self.stream = stream
+        self.depth = 0
+
+    def line(self, text=""):
+        if text:
+            self.stream.write("\t" * self.depth + text + "\n")
+        else:
+            self.stream.write("\n")
+
+    def open(self, text):
+        self.line(text + " {")
+        self.depth += 1
+
+    def close(self):
+        self.depth -= 1
+        self.line("}")
 
 class Compiler:
-    def __init__(self, program):
+    # Emits gofmt formatted Go, expressions are spaced and parenthesised the
+    # way go/printer prints them so gofmt leaves the output unchanged
+    def __init__(self, program, jobs=None):
         self.program = program
-        self.compiled = [self.load_default()]
+        self.jobs = os.cpu_count() if jobs is None else jobs
+        self.string_hash = False # memo__string emitted
+        self.functions = {declaration.name: declaration for declaration in program['body']
+                          if declaration.type == NodeType.FUNCTION_DECLARATION}
+        self.spawns = False # the program starts goroutines, set by compile()
+        self.spawned = list() # functions that need a goroutine wrapper
+        self.pending = None # functions the code generation workers compile
+        self.writer = None
 
     def load_default(self):
-        with open("lang/default.go") as default_go:
-            return default_go.read()
+        global default_source
+        mtime = os.stat(DEFAULT_PATH).st_mtime_ns
+        if default_source is None or default_source[0] != mtime:
+            with open(DEFAULT_PATH) as default_go:
+                default_source = (mtime, default_go.read())
+        return default_source[1]
 
-    def compile(self):
+    def compile(self, stream=None):
+        # writes the program to stream, without one it is returned as a str
+        if stream is None:
+            with io.StringIO() as buffer:
+                self.compile(buffer)
+                return buffer.getvalue()
+        self.writer = GoWriter(stream)
+        stream.write(self.get_prelude())
         body = self.program['body']
+        self.spawns = any(node.type == NodeType.SPAWN_STATEMENT for declaration in self.functions.values()
+                          for node in walk(declaration.body))
+        self.writer.line()
+        self.writer.line(f"const spawn__enabled = {str(self.spawns).lower()}")
+        sources = self.compile_functions()
         for statement in body:
-            _type = statement['type']
+            self.writer.line()
+            _type = statement.type
             if _type == NodeType.FUNCTION_DECLARATION:
-                name = statement['name']
-                return_type = get_default_type_mapping(statement['returnType'])
-                params = ", ".join([f"{p_name} {get_default_type_mapping(p_type)}"
-                                    for p_name, p_type in statement['params']])
-                self.compiled.append(f"func {name}({params}) {return_type} {{")
-                self.compile_statements(statement['body'])
-                self.compiled.append("}")
+                if sources is None:
+                    self.compile_function(statement)
+                    continue
+                source, spawned = next(sources)
+                stream.write(source)
+                self.spawned.extend([name for name in spawned if name not in self.spawned])
+            elif _type == NodeType.MEMO_DECLARATION:
+                self.compile_memo(statement)
+            elif _type == NodeType.PRINT_DECLARATION:
+                self.compile_print(statement)
+            elif _type == NodeType.TABLE_DECLARATION:
+                data_type = get_default_type_mapping(statement.data_type)
+                values = ", ".join([self.get_compiled_expression(value) for value in statement.values])
+                self.writer.line(f"var {statement.name} = [{len(statement.values)}]{data_type}{{{values}}}")
             else:
                 raise Exception("Unimplemented global statement: " + str(_type))
-        return "\n".join(self.compiled)
+        for name in self.spawned:
+            self.writer.line()
+            self.compile_spawn(self.functions[name])
+
+    def compile_functions(self):
+        # Go text of every function from a process pool, in program order,
+        # None when the program is too small for the pool to pay off. A
+        # function's code only depends on its own body and the names of the
+        # other functions, so the output is the same either way. The workers
+        # are forked and inherit the program, pickling it for them costs
+        # more than generating its code.
+        functions = [declaration for declaration in self.program['body']
+                     if declaration.type == NodeType.FUNCTION_DECLARATION]
+        if self.jobs <= 1 or len(functions) < PARALLEL_THRESHOLD \
+                or "fork" not in multiprocessing.get_all_start_methods():
+            return None
+        global worker
+        worker, self.pending = self, functions
+        chunks = self.jobs * 4
+        bounds = [len(functions) * index // chunks for index in range(chunks + 1)]
+        try:
+            with ProcessPoolExecutor(max_workers=self.jobs, mp_context=multiprocessing.get_context("fork")) as pool:
+                sources = pool.map(compile_function_sources, bounds[:-1], bounds[1:])
+                return iter([source for chunk in sources for source in chunk])
+        finally:
+            worker, self.pending = None, None
+
+    def compile_function(self, function):
+        self.writer.open(self.get_signature(function.name, function.params, function.return_type))
+        self.compile_statements(function.body)
+        self.writer.close()
+
+    def get_prelude(self):
+        # Go wants every import ahead of the prelude's declarations, gofmt
+        # keeps the import block sorted
+        prelude = self.load_default()
+        imports = self.program.get('imports', ())
+        if not imports:
+            return prelude
+        head, rest = prelude.split("import (\n", 1)
+        block, rest = rest.split(")\n", 1)
+        lines = set(block.splitlines()) | {f'\t"{name}"' for name in imports}
+        return head + "import (\n" + "".join([line + "\n" for line in sorted(lines)]) + ")\n" + rest
+
+    def get_signature(self, name, params, return_type):
+        compiled_params = ", ".join([f"{p_name} {get_default_type_mapping(p_type)}" for p_name, p_type in params])
+        result = get_default_type_mapping(return_type)
+        if result:
+            return f"func {name}({compiled_params}) {result}"
+        return f"func {name}({compiled_params})"
+
+    def compile_spawn(self, function):
+        # Go evaluates the arguments of a go statement right away, converted
+        # to the parameter types, the wrapper marks the goroutine done
+        arguments = ", ".join([p_name for p_name, _ in function.params])
+        self.writer.open(self.get_signature(f"{function.name}__spawn", function.params, "void"))
+        self.writer.line("defer spawn__done()")
+        self.writer.line(f"{function.name}({arguments})")
+        self.writer.close()
+
+    def compile_struct(self, name, fields):
+        # gofmt aligns the field types in a column
+        self.writer.open(f"type {name} struct")
+        width = max([len(field) for field, _ in fields])
+        for field, data_type in fields:
+            self.writer.line(f"{field.ljust(width)} {data_type}")
+        self.writer.close()
+        self.writer.line()
+
+    def compile_memo(self, memo):
+        # the wrapper that keeps the name of a memoized function, see Memoizer
+        writer = self.writer
+        name, size = memo.name, memo.size
+        result = get_default_type_mapping(memo.return_type)
+        arguments = ", ".join([p_name for p_name, _ in memo.params])
+        # doubles are keyed on their bits, -0.0 == 0.0 would share a result
+        parts = [(f"math.Float64bits({p_name})", "uint64") if p_type == "double"
+                 else (p_name, get_default_type_mapping(p_type)) for p_name, p_type in memo.params]
+        if len(memo.params) == 1:
+            key, key_type = parts[0]
+        else:
+            key_type, key = f"{name}__key", f"{name}__key{{{', '.join([part for part, _ in parts])}}}"
+            self.compile_struct(key_type, [(p_name, part_type)
+                                           for (p_name, _), (_, part_type) in zip(memo.params, parts)])
+        signature = self.get_signature(name, memo.params, memo.return_type)
+        if size == 0:
+            writer.line(f"var {name}__memo = map[{key_type}]{result}{{}}")
+            writer.line()
+            writer.open(signature)
+            writer.line(f"key := {key}")
+            writer.open(f"if value, ok := {name}__memo[key]; ok")
+            writer.line("return value")
+            writer.close()
+            writer.line(f"value := {name}__impl({arguments})")
+            writer.line(f"{name}__memo[key] = value")
+        else:
+            self.compile_struct(f"{name}__slot", [("key", key_type), ("value", result), ("ok", "bool")])
+            writer.line(f"var {name}__memo [{size}]{name}__slot")
+            writer.line()
+            writer.open(signature)
+            writer.line(f"key := {key}")
+            writer.line("hash := uint64(14695981039346656037)")
+            for p_name, p_type in memo.params:
+                if p_type == "double":
+                    part = f"math.Float64bits({p_name})"
+                elif p_type == "string":
+                    part = f"memo__string({p_name})"
+                else:
+                    part = f"uint64({p_name})"
+                writer.line(f"hash = (hash ^ {part}) * 1099511628211")
+            # spread bits the way murmur3 finalises, doubles differ in their high bits
+            writer.line("hash ^= hash >> 33")
+            writer.line("hash *= 0xff51afd7ed558ccd")
+            writer.line("hash ^= hash >> 33")
+            writer.line(f"slot := &{name}__memo[hash%{size}]")
+            writer.open("if slot.ok && slot.key == key")
+            writer.line("return slot.value")
+            writer.close()
+            writer.line(f"value := {name}__impl({arguments})")
+            writer.line(f"*slot = {name}__slot{{key, value, true}}")
+        writer.line("return value")
+        writer.close()
+        if size != 0 and "string" in {p_type for _, p_type in memo.params} and not self.string_hash:
+            self.string_hash = True
+            writer.line()
+            writer.open("func memo__string(value string) uint64")
+            writer.line("hash := uint64(14695981039346656037)")
+            writer.open("for index := 0; index < len(value); index++")
+            writer.line("hash = (hash ^ uint64(value[index])) * 1099511628211")
+            writer.close()
+            writer.line("return hash")
+            writer.close()
+
+    def compile_print(self, declaration):
+        # fmt.Println's output for arguments of known types, see BuiltinSpecializer
+        writer = self.writer
+        params = [(f"v{index}", data_type) for index, data_type in enumerate(declaration.types)]
+        writer.open(self.get_signature(declaration.name, params, "void"))
+        if self.spawns:
+            writer.line("print__lock.Lock()")
+        writer.line("buffer := print__writer.AvailableBuffer()")
+        for index, data_type in enumerate(declaration.types):
+            if index > 0:
+                writer.line("buffer = append(buffer, ' ')")
+            if data_type == "integer":
+                writer.line(f"buffer = strconv.AppendInt(buffer, v{index}, 10)")
+            elif data_type == "double":
+                writer.line(f"buffer = strconv.AppendFloat(buffer, v{index}, 'g', -1, 64)")
+            elif data_type == "bool":
+                writer.line(f"buffer = strconv.AppendBool(buffer, v{index})")
+            else:
+                writer.line(f"buffer = append(buffer, v{index}...)")
+        writer.line("print__line(buffer)")
+        if self.spawns:
+            writer.line("print__lock.Unlock()")
+        writer.close()
 
     def compile_statements(self, statements):
         for statement in statements:
-            self.compiled.append(self.get_compiled_statement(statement))
+            self.compile_statement(statement)
 
-    def get_compiled_statement(self, statement):
-        _type = statement['type']
+    def compile_statement(self, statement):
+        writer = self.writer
+        _type = statement.type
         if _type in {NodeType.VARIABLE_DECLARATION, NodeType.CONSTANTS_DECLARATION}:
             declaration_type = "var" if _type == NodeType.VARIABLE_DECLARATION else "const"
-            data_type = get_default_type_mapping(statement['dataType'])
-            name = statement['variable']
-            expression = self.get_compiled_expression(statement['expression'])
-            return f"{declaration_type} {name} {data_type} = {expression}"
-        elif _type == NodeType.EXPRESSION:
-            return self.get_compiled_expression(statement['expression'])
+            if get_element_type(statement.data_type) is not None:
+                declaration_type = "var" # Go has no constant slices
+            data_type = get_default_type_mapping(statement.data_type)
+            declaration = f"{declaration_type} {statement.variable}"
+            if data_type:
+                declaration = f"{declaration} {data_type}"
+            if statement.expression is not None: # without a type Go infers it from the expression
+                declaration = f"{declaration} = {self.get_compiled_expression(statement.expression)}"
+            writer.line(declaration)
+        elif isinstance(statement, Expression):
+            if statement.type == NodeType.CALL_EXPRESSION and self.get_builtin_name(statement) == "send":
+                channel, value = [self.get_compiled_expression(argument) for argument in statement.arguments]
+                writer.line(f"{channel} <- {value}")
+            elif statement.type == NodeType.ASSIGNMENT_EXPRESSION:
+                if statement.left.type == NodeType.INDEX_EXPRESSION:
+                    left = self.get_compiled_expression(statement.left)
+                else:
+                    left = self.get_membership_name(statement.left)
+                right = self.get_compiled_expression(statement.right)
+                writer.line(f"{left} {statement.operation} {right}")
+            else:
+                writer.line(self.get_compiled_expression(statement))
         elif _type == NodeType.RETURN_DECLARATION:
-            expression = self.get_compiled_expression(statement['expression'])
-            return f"return {expression}"
+            writer.line(f"return {self.get_compiled_expression(statement.expression)}")
         elif _type == NodeType.IF_STATEMENT:
-            expression = self.get_compiled_expression(statement['test'])
-            compiled_consequent = self.get_compiled_statement(statement['consequent'])
-            compiled_if = f"if {expression} {{ {compiled_consequent} }}"
-            if statement['alternate'] is not None:
-                compiled_alternate = self.get_compiled_statement(statement['alternate'])
-                compiled_if = f"{compiled_if} else {{ {compiled_alternate} }}"
-            return compiled_if
+            writer.open(f"if {self.get_compiled_expression(statement.test)}")
+            self.compile_body(statement.consequent)
+            alternate = statement.alternate
+            while alternate is not None and alternate.type == NodeType.IF_STATEMENT:
+                writer.depth -= 1
+                writer.open(f"}} else if {self.get_compiled_expression(alternate.test)}")
+                self.compile_body(alternate.consequent)
+                alternate = alternate.alternate
+            if alternate is not None:
+                writer.depth -= 1
+                writer.open("} else")
+                self.compile_body(alternate)
+            writer.close()
         elif _type == NodeType.WHILE_STATEMENT:
-            expression = self.get_compiled_expression(statement['test'])
-            compiled_body = self.get_compiled_statement(statement['body'])
-            return f"for {expression} {{ {compiled_body} }}"
+            if statement.test is None:
+                writer.open("for")
+            else:
+                writer.open(f"for {self.get_compiled_expression(statement.test)}")
+            self.compile_body(statement.body)
+            writer.close()
+        elif _type == NodeType.SWITCH_STATEMENT:
+            # gofmt puts the case labels at the depth of the switch
+            writer.line(f"switch {self.get_compiled_expression(statement.test)} {{")
+            for case in statement.cases:
+                values = ", ".join([self.get_compiled_expression(value) for value in case.values])
+                writer.line(f"case {values}:")
+                writer.depth += 1
+                self.compile_statements(case.body)
+                writer.depth -= 1
+            if statement.default is not None:
+                writer.line("default:")
+                writer.depth += 1
+                self.compile_statements(statement.default)
+                writer.depth -= 1
+            writer.line("}")
         elif _type == NodeType.BLOCK_STATEMENT:
-            return "\n".join([self.get_compiled_statement(line) for line in statement['body']])
+            writer.line("{")
+            writer.depth += 1
+            self.compile_statements(statement.body)
+            writer.close()
+        elif _type == NodeType.SPAWN_STATEMENT:
+            name = get_callee_name(statement.call)
+            if name not in self.functions:
+                raise LoomSyntaxError("spawn can only run a function of the program", statement)
+            if name not in self.spawned:
+                self.spawned.append(name)
+            arguments = self.get_compiled_arguments(statement.call.arguments,
+                                                    2 if len(statement.call.arguments) > 1 else 1)
+            writer.line("spawn__group.Add(1)")
+            writer.line(f"go {name}__spawn({arguments})")
+        elif _type == NodeType.WAIT_STATEMENT:
+            writer.line("spawn__group.Wait()")
         else:
             raise Exception("Unimplemented inner statement: " + str(_type))
 
+    def compile_body(self, statement):
+        # the braces of if/while already open a scope, a block body is inlined
+        if statement.type == NodeType.BLOCK_STATEMENT:
+            self.compile_statements(statement.body)
+        else:
+            self.compile_statement(statement)
+
     def get_compiled_expression(self, expression):
-        _type = expression['type']
-        if _type == NodeType.EXPRESSION:
-            return self.get_compiled_expression(expression['expression'])
-        elif _type in {NodeType.STRING_LITERAL, NodeType.INTEGER_LITERAL}:
-            return str(expression['value'])
+        # an expression on its own: a statement, condition, argument or element
+        return self.get_operand(expression, 0, 1)
+
+    def get_operand(self, expression, precedence, depth, parenthesised=False):
+        # go/printer's expr1: depth grows with the nesting of binary
+        # expressions and calls, deeper binary expressions drop the blanks
+        # around their operators
+        if parenthesised:
+            return f"({self.get_operand(expression, 0, max(depth - 1, 1))})"
+        _type = expression.type
+        if _type in {NodeType.STRING_LITERAL, NodeType.INTEGER_LITERAL, NodeType.DOUBLE_LITERAL}:
+            return str(expression.value)
         elif _type == NodeType.IDENTITY:
-            return expression['name']
+            return expression.name
         elif _type == NodeType.BINARY_EXPRESSION:
-            left = self.get_compiled_expression(expression['left'])
-            right = self.get_compiled_expression(expression['right'])
-            return f"{left} {expression['operation']} {right}"
+            return self.get_compiled_binary(expression, depth)
+        elif _type == NodeType.UNARY_EXPRESSION:
+            right = expression.right
+            # "--" would lex as a decrement
+            nested = self.is_binary(right) or self.get_unary_operation(right) is not None
+            return expression.operation + self.get_operand(right, UNARY_PRECEDENCE, depth, nested)
+        elif _type == NodeType.INDEX_EXPRESSION:
+            target = self.get_operand(expression.target, HIGHEST_PRECEDENCE, 1, self.is_operation(expression.target))
+            return f"{target}[{self.get_operand(expression.index, 0, depth + 1)}]"
+        elif _type == NodeType.SELECTOR_EXPRESSION:
+            target = self.get_operand(expression.target, HIGHEST_PRECEDENCE, depth,
+                                      self.is_operation(expression.target))
+            return f"{target}.{expression.name}"
+        elif _type == NodeType.LIST_LITERAL:
+            data_type = self.get_list_type(expression)
+            return f"{data_type}{{{self.get_compiled_arguments(expression.values, 1)}}}"
+        elif _type == NodeType.MAKE_EXPRESSION:
+            data_type = self.get_list_type(expression)
+            sizes = [size for size in (expression.length, expression.capacity) if size is not None]
+            if not sizes:
+                return f"make({data_type})"
+            return f"make({data_type}, {self.get_compiled_arguments(sizes, depth + 1)})"
         elif _type == NodeType.ASSIGNMENT_EXPRESSION:
-            left = self.get_membership_name(expression['left'])
-            right = self.get_compiled_expression(expression['right'])
-            return f"{left} {expression['operation']} {right}"
+            raise LoomSyntaxError("an assignment is a statement, it can not be part of an expression", expression)
         elif _type == NodeType.CALL_EXPRESSION:
-            name = self.get_membership_name(expression['callee'])
-            arguments = ", ".join([
-                self.get_compiled_expression(argument) for argument in expression['arguments']])
+            if expression.callee.type == NodeType.SELECTOR_EXPRESSION:
+                name = self.get_operand(expression.callee, HIGHEST_PRECEDENCE, depth)
+            else:
+                name = self.get_membership_name(expression.callee)
+            if len(expression.arguments) > 1:
+                depth += 1
+            builtin = self.get_builtin_name(expression)
+            if builtin == "receive":
+                channel = expression.arguments[0]
+                return "<-" + self.get_operand(channel, UNARY_PRECEDENCE, depth, self.is_operation(channel))
+            elif builtin == "send":
+                raise LoomSyntaxError("send() is a statement, its call can not be part of an expression",
+                                      expression)
+            arguments = self.get_compiled_arguments(expression.arguments, depth)
+            if builtin == "len":
+                return f"int64(len({arguments}))" # Go's len is an int
             return f"{name}({arguments})"
         else:
             raise Exception("Unimplemented expression type: " + str(_type))
 
+    def get_compiled_arguments(self, expressions, depth):
+        return ", ".join([self.get_operand(expression, 0, depth) for expression in expressions])
+
+    def get_compiled_binary(self, expression, depth):
+        # Beezus and Go rank some operators differently and inlining nests
+        # expressions the source never could, operands that bind looser than
+        # the operator (or as loose on the right) get parentheses
+        operation = expression.operation
+        precedence = PRECEDENCES[operation]
+        left, right = expression.left, expression.right
+        left_nested = self.is_binary(left) and PRECEDENCES[left.operation] < precedence
+        right_nested = self.is_binary(right) and PRECEDENCES[right.operation] <= precedence
+        blank = precedence < self.get_cutoff(expression, depth)
+        left_depth = depth
+        if not self.is_binary(left) or PRECEDENCES[left.operation] != precedence:
+            left_depth += 1
+        compiled_left = self.get_operand(left, precedence, left_depth, left_nested)
+        compiled_right = self.get_operand(right, precedence + 1, depth + 1, right_nested)
+        if blank:
+            return f"{compiled_left} {operation} {compiled_right}"
+        if compiled_right[0] in COMBINING.get(operation, ""):
+            compiled_right = " " + compiled_right
+        return f"{compiled_left}{operation}{compiled_right}"
+
+    def get_cutoff(self, expression, depth):
+        # the precedence below which operators of expression get blanks
+        has4, has5, problem = self.walk_binary(expression)
+        if problem > 0:
+            return problem + 1
+        if has4 and has5:
+            return 5 if depth == 1 else 4
+        return 6 if depth == 1 else 4
+
+    def walk_binary(self, expression):
+        precedence = PRECEDENCES[expression.operation]
+        has4, has5, problem = precedence == 4, precedence == 5, 0
+        left, right = expression.left, expression.right
+        nested = list()
+        if self.is_binary(left) and PRECEDENCES[left.operation] >= precedence:
+            nested.append(left)
+        if self.is_binary(right) and PRECEDENCES[right.operation] > precedence:
+            nested.append(right)
+        for operand in nested:
+            operand_has4, operand_has5, operand_problem = self.walk_binary(operand)
+            has4, has5, problem = has4 or operand_has4, has5 or operand_has5, max(problem, operand_problem)
+        unary = self.get_unary_operation(right)
+        if unary is not None:
+            if expression.operation + unary in {"/*", "&&", "&^"}:
+                problem = 5
+            elif expression.operation + unary in {"++", "--"}:
+                problem = max(problem, 4)
+        return has4, has5, problem
+
+    def is_binary(self, expression):
+        return expression.type == NodeType.BINARY_EXPRESSION
+
+    def is_operation(self, expression):
+        return self.is_binary(expression) or self.get_unary_operation(expression) is not None
+
+    def get_unary_operation(self, expression):
+        # the operator of what Go parses as a unary expression, None otherwise
+        _type = expression.type
+        if _type == NodeType.UNARY_EXPRESSION:
+            return expression.operation
+        elif _type in {NodeType.INTEGER_LITERAL, NodeType.DOUBLE_LITERAL} and str(expression.value).startswith("-"):
+            return "-"
+        elif _type == NodeType.CALL_EXPRESSION and self.get_builtin_name(expression) == "receive":
+            return "<-"
+        return None
+
+    def get_builtin_name(self, call):
+        # builtins Go spells differently, unless the program declares the name
+        name = get_callee_name(call)
+        return None if name in self.functions else name
+
+    def get_list_type(self, expression):
+        if expression.data_type is None:
+            raise LoomSyntaxError("Cannot tell the element type of the list or channel, "
+                                  "declare it with a list<T> or chan<T> type first", expression)
+        return get_default_type_mapping(expression.data_type)
+
     def get_membership_name(self, membership):
-        _type = membership['type']
-        if _type == NodeType.IDENTITY:
-            return membership['name']
-        elif _type == NodeType.MEMBERSHIP_EXPRESSION:
-            return membership['name'] + "_" + self.get_membership_name(membership['property'])
-        else:
-            raise Exception("Unimplemented membership expression type: " + str(_type))
\ No newline at end of file
+        return get_membership_name(membership)
@@ -1,56 +1,179 @@
 package main
 
 import (
-    "os"
-    "fmt"
-    "bufio"
-    "strconv"
+	"bufio"
+	"fmt"
+	"os"
+	"strconv"
+	"sync"
 )
 
-func main() { main__() }
+func main() {
+	defer flush()
+	main__()
+}
+
+// Goroutines started by spawn, wait joins them. The compiler declares
+// spawn__enabled, the runtime only takes its locks when it is true.
+var spawn__group sync.WaitGroup
+
+func spawn__done() {
+	if value := recover(); value != nil {
+		flush() // main's deferred flush never runs after a goroutine panics
+		panic(value)
+	}
+	spawn__group.Done()
+}
+
+// One buffered reader and writer for the whole program. The writer is line
+// buffered on a terminal, otherwise it is written when full, by flush() and
+// when main__ returns or panics. Goroutines share them through the locks.
+var input__reader = bufio.NewReaderSize(os.Stdin, 65536)
+var input__lock sync.Mutex
+var print__writer = bufio.NewWriterSize(os.Stdout, 65536)
+var print__lock sync.Mutex
+var print__terminal = is__terminal(os.Stdout)
+var input__terminal = print__terminal || is__terminal(os.Stdin)
+
+// A character device other than the null device, without the per OS isatty
+func is__terminal(file *os.File) bool {
+	info, err := file.Stat()
+	if err != nil || info.Mode()&os.ModeCharDevice == 0 {
+		return false
+	}
+	null, err := os.Stat(os.DevNull)
+	return err != nil || !os.SameFile(info, null)
+}
+
+func flush() {
+	if spawn__enabled {
+		print__lock.Lock()
+		defer print__lock.Unlock()
+	}
+	print__writer.Flush()
+}
 
 func print(message ...any) {
-    fmt.Println(message...)
+	if spawn__enabled {
+		print__lock.Lock()
+		defer print__lock.Unlock()
+	}
+	fmt.Fprintln(print__writer, message...)
+	if print__terminal {
+		print__writer.Flush()
+	}
+}
+
+// Typed prints (print__<signature>, generated next to the program) hold
+// print__lock when spawn__enabled, append their arguments to print__writer.AvailableBuffer()
+// and hand it here
+func print__line(buffer []byte) {
+	print__writer.Write(append(buffer, '\n'))
+	if print__terminal {
+		print__writer.Flush()
+	}
+}
+
+func input__prompt(message []any) {
+	if len(message) == 0 {
+		return
+	}
+	if spawn__enabled {
+		print__lock.Lock()
+		defer print__lock.Unlock()
+	}
+	fmt.Fprint(print__writer, message...)
+	if input__terminal {
+		print__writer.Flush()
+	}
 }
 
 func input(message ...any) string {
-    fmt.Print(message...)
-    input, _ := bufio.NewReader(os.Stdin).ReadString('\n')
-    return input[:len(input)-1]
+	if spawn__enabled {
+		input__lock.Lock()
+		defer input__lock.Unlock()
+	}
+	input__prompt(message)
+	line, _ := input__reader.ReadString('\n')
+	if len(line) > 0 && line[len(line)-1] == '\n' {
+		line = line[:len(line)-1]
+	}
+	return line
+}
+
+// int(input(...)) without the string: a plain decimal line is parsed in
+// place, anything else goes through int__string
+func inputInt(message ...any) int64 {
+	if spawn__enabled {
+		input__lock.Lock()
+		defer input__lock.Unlock() // line points into the reader's buffer
+	}
+	input__prompt(message)
+	line, err := input__reader.ReadSlice('\n')
+	if err == bufio.ErrBufferFull {
+		rest, _ := input__reader.ReadBytes('\n')
+		line = append(append([]byte(nil), line...), rest...)
+	}
+	if len(line) > 0 && line[len(line)-1] == '\n' {
+		line = line[:len(line)-1]
+	}
+	digits := line
+	if len(digits) > 0 && (digits[0] == '-' || digits[0] == '+') {
+		digits = digits[1:]
+	}
+	if len(digits) == 0 || len(digits) > 18 {
+		return int__string(string(line))
+	}
+	var value int64
+	for _, digit := range digits {
+		if digit < '0' || digit > '9' {
+			return int__string(string(line))
+		}
+		value = value*10 + int64(digit-'0')
+	}
+	if line[0] == '-' {
+		return -value
+	}
+	return value
 }
 
 func int(value any) int64 {
-    switch v := value.(type) {
-    case int8:
-        return int64(v)
-    case int16:
-        return int64(v)
-    case int32:
-        return int64(v)
-    case int64:
-        return v
-    case uint:
-        return int64(v)
-    case uint8:
-        return int64(v)
-    case uint16:
-        return int64(v)
-    case uint32:
-        return int64(v)
-    case uint64:
-        return int64(v)
-    case float32:
-        return int64(v)
-    case float64:
-        return int64(v)
-    case string:
-        if i, err := strconv.ParseInt(v, 10, 64); err == nil {
-            return i
-        }
-        if f, err := strconv.ParseFloat(v, 64); err == nil {
-            return int64(f)
-        }
-    }
-
-    panic(fmt.Sprintf("int() can convert string or float to int, but not %T", value))
+	switch v := value.(type) {
+	case int8:
+		return int64(v)
+	case int16:
+		return int64(v)
+	case int32:
+		return int64(v)
+	case int64:
+		return v
+	case uint:
+		return int64(v)
+	case uint8:
+		return int64(v)
+	case uint16:
+		return int64(v)
+	case uint32:
+		return int64(v)
+	case uint64:
+		return int64(v)
+	case float32:
+		return int64(v)
+	case float64:
+		return int64(v)
+	case string:
+		return int__string(v)
+	}
+
+	panic(fmt.Sprintf("int() can convert string or float to int, but not %T", value))
+}
+
+func int__string(value string) int64 {
+	if i, err := strconv.ParseInt(value, 10, 64); err == nil {
+		return i
+	}
+	if f, err := strconv.ParseFloat(value, 64); err == nil {
+		return int64(f)
+	}
+	panic(fmt.Sprintf("int() can convert string or float to int, but not %T", value))
 }
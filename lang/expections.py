@@ -4,8 +4,19 @@ class TokenError(Exception):
         self.message = message
         self.line = line
 
+    def __reduce__(self):
+        return (self.__class__, (self.message, self.line))
+
 class LoomSyntaxError(Exception):
-    def __init__(self, message, token=None):
-        line = "" if token is None else f", at line {str(token.line)}"
-        super().__init__(message + line)
-        self.token = token
\ No newline at end of file
+    def __init__(self, message, token=None, line=None):
+        if token is not None:
+            line = token.line
+        super().__init__(message + ("" if line is None else f", at line {str(line)}"))
+        self.message = message
+        self.token = token
+        self.line = line
+
+    def __reduce__(self):
+        # the token points into the (mmap) source, a copy sent between
+        # processes only keeps the line
+        return (self.__class__, (self.message, None, self.line))
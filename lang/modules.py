@@ -0,0 +1,109 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from lang.parser import Parser
+from lang.tokenizer import Tokenizer
+from lang.utils.source import open_source
+from lang.expections import LoomSyntaxError
+from lang.utils.ast_node import NodeType
+from lang.stats import get_cpu_time
+
+# Below this much uncached source the process pool costs more than it saves
+PARALLEL_THRESHOLD = 256 * 1024
+
+def parse_module_file(grammar, beezus_home, program_home, lib_path):
+    # runs in a worker process, the compiled grammar is cached per process.
+    # Returns the declarations with the tokens, wall and CPU time it took
+    wall, cpu = time.perf_counter(), get_cpu_time()
+    with open_source(lib_path) as import_source:
+        parser = Parser(Tokenizer(grammar), beezus_home, program_home, import_source, dict())
+        declarations = parser.parse_module()
+    return declarations, parser.tokens.count, time.perf_counter() - wall, get_cpu_time() - cpu
+
+class ModuleGraph:
+    def __init__(self, parser, jobs=None, stats=None):
+        self.parser = parser
+        self.jobs = os.cpu_count() if jobs is None else jobs
+        self.stats = stats
+        self.paths = dict() # module name -> resolved path
+        self.edges = dict() # path -> imported module names
+        self.order = list() # paths, dependencies first
+
+    def load(self, declarations):
+        # Resolves every module reachable through import headers, parses the
+        # ones missing from the module cache (in parallel when worthwhile) and
+        # hands them to the parser, which links them in its usual order.
+        imports = [declaration.module for declaration in declarations
+                   if declaration.type == NodeType.IMPORT_DECLARATION]
+        self.build(imports)
+        module_cache = self.parser.module_cache
+        pending = list()
+        for lib_path in self.order:
+            wall, cpu = time.perf_counter(), get_cpu_time()
+            with open_source(lib_path) as import_source:
+                key = None
+                if module_cache is not None:
+                    key = module_cache.get_key(import_source)
+                    cached = module_cache.load(key)
+                    if cached is not None:
+                        self.parser.modules[lib_path] = cached
+                        if self.stats is not None:
+                            self.stats.add_module(lib_path, "cached", time.perf_counter() - wall,
+                                                  get_cpu_time() - cpu)
+                        continue
+                pending.append((lib_path, key, len(import_source)))
+
+        for (lib_path, key, _), (declarations, tokens, wall, cpu) in zip(pending, self.parse_modules(pending)):
+            self.parser.modules[lib_path] = declarations
+            if self.stats is not None:
+                self.stats.add_module(lib_path, "parsed", wall, cpu, tokens)
+            if key is not None:
+                module_cache.store(key, declarations)
+        return self.order
+
+    def parse_modules(self, pending):
+        parser = self.parser
+        grammar = parser.tokenizer.grammar
+        lib_paths = [lib_path for lib_path, _, _ in pending]
+        arguments = (
+            [grammar] * len(lib_paths),
+            [parser.beezus_home] * len(lib_paths),
+            [parser.program_home] * len(lib_paths),
+            lib_paths
+        )
+        source_size = sum(size for _, _, size in pending)
+        if self.jobs <= 1 or len(pending) < 2 or source_size < PARALLEL_THRESHOLD:
+            return list(map(parse_module_file, *arguments))
+        with ProcessPoolExecutor(max_workers=min(self.jobs, len(pending))) as pool:
+            return list(pool.map(parse_module_file, *arguments))
+
+    def build(self, imports):
+        visiting = list() # module names on the current dfs path
+        for import_module in imports:
+            self.visit(import_module, visiting)
+
+    def visit(self, import_module, visiting):
+        if import_module in visiting:
+            cycle = visiting[visiting.index(import_module):] + [import_module]
+            raise LoomSyntaxError(f"Cyclic import {' -> '.join(cycle)}")
+        if import_module in self.paths:
+            return
+        lib_path = self.parser.resolve_import(import_module)
+        first_visit = lib_path not in self.edges
+        if first_visit:
+            self.edges[lib_path] = self.scan_header(lib_path)
+        visiting.append(import_module)
+        for dependency in self.edges[lib_path]:
+            self.visit(dependency, visiting)
+        visiting.pop()
+        self.paths[import_module] = lib_path
+        if first_visit:
+            self.order.append(lib_path)
+
+    def scan_header(self, lib_path):
+        parser = self.parser
+        with open_source(lib_path) as import_source:
+            header = Parser(parser.tokenizer, parser.beezus_home, parser.program_home,
+                            import_source, dict())
+            return header.parse_header()
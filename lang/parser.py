@@ -2,43 +2,169 @@ import os
 import re
 
 from lang.tokenizer import TokenType
-from lang.utils.generator import Generator
+from lang.resolver import ModuleResolver, get_search_paths
+from lang.utils.source import open_source
+from lang.utils.generator import Generator, StreamGenerator
 from lang.expections import LoomSyntaxError
-from lang.utils.ast_node import NodeType
+from lang.utils.ast_node import NodeType, ImportDeclaration, FunctionDeclaration, ReturnDeclaration, \
+    VariableDeclaration, ConstantsDeclaration, IfStatement, WhileStatement, BlockStatement, \
+    AssignmentExpression, BinaryExpression, UnaryExpression, CallExpression, IntegerLiteral, \
+    StringLiteral, DoubleLiteral, Identity, MembershipExpression, IndexExpression, ListLiteral, \
+    MakeExpression, SpawnStatement, WaitStatement, LazyBody, get_element_type, get_channel_type
+
+# Binding power of every binary operator, higher binds tighter
+BINDING_POWERS = {
+    TokenType.OR: 1,
+    TokenType.AND: 2,
+    TokenType.EQUAL_EQUAL: 3,
+    TokenType.BANG_EQUAL: 3,
+    TokenType.LESSER: 4,
+    TokenType.GREATER: 4,
+    TokenType.LESSER_EQUAL: 4,
+    TokenType.GREATER_EQUAL: 4,
+    TokenType.PLUS: 5,
+    TokenType.MINUS: 5,
+    TokenType.STAR: 6,
+    TokenType.SLASH: 6
+}
+
+# Types written with an element type, name<T>
+GENERIC_TYPES = {"list", "chan"}
+
+# Types of the literals, the element type of a list literal made of them
+LITERAL_TYPES = {
+    NodeType.INTEGER_LITERAL: "integer",
+    NodeType.DOUBLE_LITERAL: "double",
+    NodeType.STRING_LITERAL: "string"
+}
 
 class Parser:
-    def __init__(self, tokenizer, beezus_home, program_home, program, imports):
+    def __init__(self, tokenizer, beezus_home, program_home, program, imports, module_cache=None, line=1,
+                 resolver=None):
         self.package_name = None
         self.tokenizer = tokenizer
-        self.tokens = self.get_tokens(program)
+        self.tokens = self.get_tokens(program, line)
         self.pointer = 0
         self.program_home = program_home
         self.beezus_home = beezus_home
         self.data_types = {"integer", "string", "double"}
+        self.types = dict() # declared types of the parameters and locals of the body being parsed
+        self.return_type = None
         self.imports = imports
+        self.module_cache = module_cache
+        self.resolver = resolver # built on the first import without one
+        self.declarations = list() # this module's own top level, in source order
+        self.modules = dict() # declarations of modules loaded ahead of linking, by path
+        self.body_tokens = 0 # tokens of the lazy bodies parse_body lexed again
         self.program = {
-            "body": []
+            "body": [],
+            "imports": set() # Go packages the passes need next to the prelude
         }
 
-    def get_tokens(self, program):
+    def get_tokens(self, program, line=1):
         self.tokenizer.reset()
-        raw_tokens = self.tokenizer.tokenize(program)
-        return Generator(raw_tokens)
+        self.tokenizer.line = line
+        if isinstance(program, str):
+            raw_tokens = self.tokenizer.tokenize(program)
+            return Generator(raw_tokens)
+        # bytes-like sources (see open_source) are tokenized lazily
+        return StreamGenerator(self.tokenizer.stream(program, line))
 
     def parse(self):
-        while self.tokens.has_next():
-            token = self.tokens.peek()
-            if token.type == TokenType.KW_PACKAGE:
-                self.parse_package()
-            elif token.type == TokenType.KW_IMPORT:
-                self.parse_import()
-            elif token.type == TokenType.ID:
-                self.parse_global_declaration()
-            else:
-                raise LoomSyntaxError("Invalid Syntax", token)
-            self.tokens.next()
+        self.parse_module()
+        self.link_declarations(self.declarations)
         return self.program
+
+    def parse_module(self):
+        try:
+            while self.tokens.has_next():
+                token = self.tokens.peek()
+                if token.type == TokenType.KW_PACKAGE:
+                    self.parse_package()
+                elif token.type == TokenType.KW_IMPORT:
+                    self.parse_import()
+                elif token.type == TokenType.ID:
+                    self.parse_global_declaration()
+                else:
+                    raise LoomSyntaxError("Invalid Syntax", token)
+                self.tokens.next()
+        finally:
+            self.tokens.close()
+        return self.declarations
+
+    def parse_header(self):
+        # only the leading package and import statements, enough to build the module graph
+        try:
+            while self.tokens.has_next() and self.tokens.peek().match(TokenType.KW_PACKAGE,
+                                                                      TokenType.KW_IMPORT):
+                if self.tokens.peek().type == TokenType.KW_PACKAGE:
+                    self.parse_package()
+                else:
+                    self.parse_import()
+                self.tokens.next()
+        finally:
+            self.tokens.close()
+        return [declaration.module for declaration in self.declarations
+                if declaration.type == NodeType.IMPORT_DECLARATION]
+
+    def link_declarations(self, declarations):
+        # imported bodies are spliced in at the point of their import
+        for declaration in declarations:
+            if declaration.type == NodeType.IMPORT_DECLARATION:
+                self.link_import(declaration.module)
+            else:
+                self.program['body'].append(declaration)
+
+    def link_import(self, import_module):
+        if import_module in self.imports:
+            return
+        lib_path = self.resolve_import(import_module)
+        self.imports[import_module] = lib_path
+        self.link_declarations(self.load_module(lib_path))
+
+    def resolve_import(self, import_module):
+        lib_path = self.get_resolver().resolve(import_module)
+        if lib_path is None:
+            raise LoomSyntaxError(f"No module found named '{import_module}'")
+        return lib_path
+
+    def get_resolver(self):
+        if self.resolver is None:
+            self.resolver = ModuleResolver(get_search_paths(self.beezus_home, self.program_home))
+        return self.resolver
+
+    def load_module(self, lib_path):
+        if lib_path in self.modules:
+            return self.modules[lib_path]
+        with open_source(lib_path) as import_source:
+            key = None
+            if self.module_cache is not None:
+                key = self.module_cache.get_key(import_source)
+                declarations = self.module_cache.load(key)
+                if declarations is not None:
+                    return declarations
+            parser = Parser(self.tokenizer, self.beezus_home, self.program_home,
+                            import_source, self.imports)
+            declarations = parser.parse_module()
+            if key is not None:
+                self.module_cache.store(key, declarations)
+            return declarations
     
+    def parse_body(self, function):
+        if not isinstance(function.body, LazyBody):
+            return function.body
+        lazy_body = function.body
+        parser = Parser(self.tokenizer, self.beezus_home, self.program_home,
+                        lazy_body.source, self.imports, line=lazy_body.line)
+        parser.types = dict(function.params)
+        parser.return_type = function.return_type
+        try:
+            function.body = parser.parse_block()
+        finally:
+            parser.tokens.close()
+            self.body_tokens += parser.tokens.count
+        return function.body
+
     def parse_statements(self):
         statements = list()
         while self.tokens.has_next():
@@ -60,6 +186,10 @@ class Parser:
             return self.parse_while()
         elif token.type == TokenType.OPEN_BRACE:
             return self.parse_block_statement()
+        elif token.type == TokenType.KW_SPAWN:
+            return self.parse_spawn()
+        elif token.type == TokenType.KW_WAIT:
+            return self.parse_wait()
         else:
             expression = self.parse_expression()
             self.tokens.next().expect(TokenType.SEMICOLON)
@@ -74,32 +204,21 @@ class Parser:
         self.tokens.peek().expect(TokenType.SEMICOLON)
 
     def parse_import(self):
+        line = self.tokens.peek().line
         self.tokens.next()
         self.tokens.peek().expect(TokenType.ID)
         import_module = self.parse_dir_id()
         self.tokens.peek().expect(TokenType.SEMICOLON)
-        if import_module not in self.imports:
-            self.imports.add(import_module)
-            relative_lib_path = os.path.join(self.program_home, import_module + ".bz")
-            module_lib_path = os.path.join(os.path.join(self.beezus_home, "libs"), import_module + ".bz")
-            lib_path = None
-            if os.path.exists(relative_lib_path):
-                lib_path = relative_lib_path
-            elif os.path.exists(module_lib_path):
-                lib_path = module_lib_path
-            else:
-                raise LoomSyntaxError(f"No module found named '{import_module}'")
-            with open(lib_path) as import_file:
-                parser = Parser(self.tokenizer, self.beezus_home, self.program_home,
-                                import_file.read(), self.imports)
-                body = parser.parse()['body']
-                self.program.get('body').extend(body)
+        self.declarations.append(ImportDeclaration(line, import_module))
+
+    def get_import_candidates(self, import_module):
+        return self.get_resolver().get_candidates(import_module)
 
     def parse_global_declaration(self):
         return_type = "void" # To Support fancy no return type function declaration
         name = self.tokens.peek()
-        if self.tokens.peek(1).match(TokenType.ID):
-            return_type = name.raw
+        if self.tokens.peek(1).match(TokenType.ID, TokenType.LESSER):
+            return_type = self.parse_type()
             name = self.tokens.next()
         if self.tokens.peek(1).match(TokenType.OPEN_PARAM):
             self.parse_function(name, return_type)
@@ -111,20 +230,27 @@ class Parser:
         self.tokens.next()
         expression = self.parse_expression()
         self.tokens.next().expect(TokenType.SEMICOLON)
-        return {
-            "type": NodeType.RETURN_DECLARATION,
-            "line": line,
-            "expression": expression
-        }
+        self.set_type(expression, self.return_type)
+        return ReturnDeclaration(line, expression)
+
+    def parse_spawn(self):
+        token = self.tokens.peek()
+        self.tokens.next()
+        call = self.parse_expression()
+        if call.type != NodeType.CALL_EXPRESSION:
+            raise LoomSyntaxError("spawn takes a function call", token)
+        self.tokens.next().expect(TokenType.SEMICOLON)
+        return SpawnStatement(token.line, call)
+
+    def parse_wait(self):
+        line = self.tokens.peek().line
+        self.tokens.next().expect(TokenType.SEMICOLON)
+        return WaitStatement(line)
 
     def parse_block_statement(self):
         line = self.tokens.peek().line
         statements = self.parse_block()
-        return {
-            "type": NodeType.BLOCK_STATEMENT,
-            "line": line,
-            "body": statements
-        }
+        return BlockStatement(line, statements)
 
     def parse_while(self):
         line = self.tokens.peek().line
@@ -132,12 +258,7 @@ class Parser:
         expression = self.parse_expression()
         self.tokens.next()
         body = self.parse_statement()
-        return {
-            "type": NodeType.WHILE_STATEMENT,
-            "line": line,
-            "test": expression,
-            "body": body
-        }
+        return WhileStatement(line, expression, body)
 
     def parse_if(self):
         line = self.tokens.peek().line
@@ -149,34 +270,68 @@ class Parser:
         if self.tokens.peek(1).match(TokenType.KW_ELSE):
             self.tokens.next(2) # skipping else keyword
             alternate = self.parse_statement()
-        return {
-            "type": NodeType.IF_STATEMENT,
-            "line": line,
-            "test": expression,
-            "consequent": consequent,
-            "alternate": alternate
-        }
+        return IfStatement(line, expression, consequent, alternate)
 
     def parse_declaration(self):
         token = self.tokens.peek()
-        type_ = NodeType.VARIABLE_DECLARATION
+        declaration = VariableDeclaration
         if token.type == TokenType.KW_CONST:
-            type_ = NodeType.CONSTANTS_DECLARATION
+            declaration = ConstantsDeclaration
         self.tokens.next().expect(TokenType.ID)
-        data_type = self.tokens.peek().raw
+        data_type = self.parse_type()
         self.tokens.next().expect(TokenType.ID)
         variable = self.tokens.peek().raw
         self.tokens.next().expect(TokenType.EQUAL)
         self.tokens.next()
         expression = self.parse_expression()
         self.tokens.next().expect(TokenType.SEMICOLON)
-        return {
-            "type": type_,
-            "line": token.line,
-            "dataType": data_type,
-            "variable": variable,
-            "expression": expression
-        }
+        self.set_type(expression, data_type)
+        self.types[variable] = data_type
+        return declaration(token.line, data_type, variable, expression)
+
+    def parse_type(self):
+        # from the first token of a type to its last one, list<list<integer>>
+        # is two GREATER tokens as the tokenizer has no >>
+        token = self.tokens.peek()
+        token.expect(TokenType.ID)
+        if token.raw in GENERIC_TYPES and self.tokens.peek(1).match(TokenType.LESSER):
+            self.tokens.next(2)
+            element_type = self.parse_type()
+            self.tokens.next().expect(TokenType.GREATER)
+            return f"{token.raw}<{element_type}>"
+        return token.raw
+
+    def get_type(self, expression):
+        # the type of an expression as far as the parser can tell, or None
+        _type = expression.type
+        if _type in LITERAL_TYPES:
+            return LITERAL_TYPES[_type]
+        elif _type == NodeType.IDENTITY:
+            return self.types.get(expression.name)
+        elif _type == NodeType.INDEX_EXPRESSION:
+            return get_element_type(self.get_type(expression.target))
+        elif _type in {NodeType.LIST_LITERAL, NodeType.MAKE_EXPRESSION}:
+            return expression.data_type
+        elif _type == NodeType.CALL_EXPRESSION and expression.callee.type == NodeType.IDENTITY \
+                and expression.callee.name == "receive" and len(expression.arguments) == 1:
+            return get_channel_type(self.get_type(expression.arguments[0]))
+        elif _type == NodeType.UNARY_EXPRESSION and expression.operation == "-":
+            return self.get_type(expression.right)
+        return None
+
+    def set_type(self, expression, data_type):
+        # list literals, newList() and newChannel() take the type of the place
+        # they are stored in, a declaration, a return, an assignment, an
+        # append or a send
+        element_type = get_element_type(data_type)
+        if expression.type == NodeType.LIST_LITERAL and element_type is not None:
+            expression.data_type = data_type
+            for value in expression.values:
+                self.set_type(value, element_type)
+        elif expression.type == NodeType.MAKE_EXPRESSION:
+            channel = expression.length is None
+            if (get_channel_type(data_type) if channel else element_type) is not None:
+                expression.data_type = data_type
 
     def parse_pass(self):
         self.tokens.next()
@@ -186,19 +341,13 @@ class Parser:
         function_name = name.raw
         function_args = self.parse_function_args()
         self.tokens.next()
-        function_body = self.parse_block()
+        function_body = self.skip_block()
         if self.package_name == "main" and name.raw == "main":
             function_name = "main__"
         elif self.package_name != "main":
             function_name = f"{self.package_name}_{function_name}"
-        self.program['body'].append({
-            "type": NodeType.FUNCTION_DECLARATION,
-            "returnType": return_type,
-            "name": function_name,
-            "line": line,
-            "params": function_args,
-            "body": function_body
-        })
+        self.declarations.append(FunctionDeclaration(line, function_name, return_type,
+                                                     function_args, function_body))
 
     def parse_function_args(self):
         args = set()
@@ -209,17 +358,34 @@ class Parser:
             return args_list
         while True:
             self.tokens.next().expect(TokenType.ID)
-            data_type = self.tokens.peek()
+            data_type = self.parse_type()
             self.tokens.next().expect(TokenType.ID)
             arg = self.tokens.peek()
             if arg.raw in args:
                 raise LoomSyntaxError(f"Duplicate parameter '{arg.raw}' in function declaration", arg)
             args.add(arg.raw)
-            args_list.append((arg.raw, data_type.raw))
+            args_list.append((arg.raw, data_type))
             if self.tokens.next().type == TokenType.CLOSE_PARAM:
                 return args_list
             self.tokens.peek().expect(TokenType.COMMA)
 
+    def skip_block(self):
+        # brace matching only, the body is parsed on demand by parse_body
+        # (see TreeShaker, which only asks for reachable functions)
+        open_brace = self.tokens.peek()
+        open_brace.expect(TokenType.OPEN_BRACE)
+        depth = 0
+        while self.tokens.has_next():
+            token = self.tokens.peek()
+            if token.type == TokenType.OPEN_BRACE:
+                depth += 1
+            elif token.type == TokenType.CLOSE_BRACE:
+                depth -= 1
+                if depth == 0:
+                    return LazyBody(open_brace.source[open_brace.start:token.end], open_brace.line)
+            self.tokens.next()
+        raise LoomSyntaxError("Unclosed function body", open_brace)
+
     def parse_block(self):
         self.tokens.peek().expect(TokenType.OPEN_BRACE)
         statements = self.parse_statements()
@@ -230,11 +396,22 @@ class Parser:
         self.tokens.next()
         arguments = self.parse_function_arguments()
         self.tokens.peek().expect(TokenType.CLOSE_PARAM)
-        return {
-            "type": NodeType.CALL_EXPRESSION,
-            "callee": identifier,
-            "arguments": arguments
-        }
+        if identifier.type == NodeType.IDENTITY and identifier.name == "newList":
+            if len(arguments) not in {1, 2}:
+                raise LoomSyntaxError("newList() takes a length and an optional capacity", self.tokens.peek())
+            capacity = arguments[1] if len(arguments) == 2 else None
+            return MakeExpression(identifier.line, None, arguments[0], capacity)
+        if identifier.type == NodeType.IDENTITY and identifier.name == "newChannel":
+            if len(arguments) > 1:
+                raise LoomSyntaxError("newChannel() takes an optional capacity", self.tokens.peek())
+            return MakeExpression(identifier.line, None, None, arguments[0] if arguments else None)
+        if identifier.type == NodeType.IDENTITY and identifier.name == "append" and arguments:
+            element_type = get_element_type(self.get_type(arguments[0]))
+            for argument in arguments[1:]:
+                self.set_type(argument, element_type)
+        elif identifier.type == NodeType.IDENTITY and identifier.name == "send" and len(arguments) == 2:
+            self.set_type(arguments[1], get_channel_type(self.get_type(arguments[0])))
+        return CallExpression(identifier.line, identifier, arguments)
     
     def parse_function_arguments(self):
         arguments = list()
@@ -246,128 +423,46 @@ class Parser:
         return arguments
 
     def parse_expression(self):
-        line = self.tokens.peek().line
-        expression = {
-            "type": NodeType.EXPRESSION,
-            "line": line,
-            "expression": self.assignment()
-        }
+        expression = self.assignment()
         self.tokens.next(-1)
         return expression
 
     def assignment(self):
-        left = self.logical_or()
+        left = self.binary()
         if self.tokens.has_next() and self.tokens.peek().match(TokenType.EQUAL,
                 TokenType.PLUS_EQUAL,
                 TokenType.MINUS_EQUAL):
+            line = self.tokens.peek().line
             operation = self.tokens.peek().raw
             self.tokens.next()
-            right = self.logical_or()
-            if left["type"] not in {NodeType.IDENTITY, NodeType.MEMBERSHIP_EXPRESSION}:
+            right = self.binary()
+            if left.type not in {NodeType.IDENTITY, NodeType.MEMBERSHIP_EXPRESSION, NodeType.INDEX_EXPRESSION}:
                 raise LoomSyntaxError("cannot assign to an expression")
-            return {
-                "type": NodeType.ASSIGNMENT_EXPRESSION,
-                "left": left,
-                "operation": operation,
-                "right": right
-            }
+            self.set_type(right, self.get_type(left))
+            return AssignmentExpression(line, left, operation, right)
         return left
 
-    def logical_or(self):
-        left_expression = self.logical_and()
-        while self.tokens.has_next() and self.tokens.peek().match(TokenType.OR):
-            operation = self.tokens.peek().raw
-            self.tokens.next()
-            right_expression = self.logical_and()
-            left_expression = {
-                "type": NodeType.BINARY_EXPRESSION,
-                "left": left_expression,
-                "operation": operation,
-                "right": right_expression
-            }
-        return left_expression
-
-    def logical_and(self):
-        left_expression = self.equality()
-        while self.tokens.has_next() and self.tokens.peek().match(TokenType.AND):
-            operation = self.tokens.peek().raw
-            self.tokens.next()
-            right_expression = self.equality()
-            left_expression = {
-                "type": NodeType.BINARY_EXPRESSION,
-                "left": left_expression,
-                "operation": operation,
-                "right": right_expression
-            }
-        return left_expression
-    
-    def equality(self):
-        left_expression = self.comparison()
-        while self.tokens.has_next() and self.tokens.peek().match(TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL):
-            operation = self.tokens.peek().raw
-            self.tokens.next()
-            right_expression = self.comparison()
-            left_expression = {
-                "type": NodeType.BINARY_EXPRESSION,
-                "left": left_expression,
-                "operation": operation,
-                "right": right_expression
-            }
-        return left_expression
-
-    def comparison(self):
-        left_expression = self.term()
-        while self.tokens.has_next() and self.tokens.peek().match(TokenType.LESSER, TokenType.GREATER,
-                                                                  TokenType.LESSER_EQUAL, TokenType.GREATER_EQUAL):
-            operation = self.tokens.peek().raw
-            self.tokens.next()
-            right_expression = self.term()
-            left_expression = {
-                "type": NodeType.BINARY_EXPRESSION,
-                "left": left_expression,
-                "operation": operation,
-                "right": right_expression
-            }
-        return left_expression
-
-    def term(self):
-        left_expression = self.factor()
-        while self.tokens.has_next() and self.tokens.peek().match(TokenType.PLUS, TokenType.MINUS):
-            operation = self.tokens.peek().raw
-            self.tokens.next()
-            right_expression = self.factor()
-            left_expression = {
-                "type": NodeType.BINARY_EXPRESSION,
-                "left": left_expression,
-                "operation": operation,
-                "right": right_expression
-            }
-        return left_expression
-
-    def factor(self):
+    def binary(self, min_power=0):
+        # precedence climbing over BINDING_POWERS, every level is left associative
         left_expression = self.unary()
-        while self.tokens.has_next() and self.tokens.peek().match(TokenType.STAR, TokenType.SLASH):
-            operation = self.tokens.peek().raw
-            self.tokens.next()
-            right_expression = self.unary()
-            left_expression = {
-                "type": NodeType.BINARY_EXPRESSION,
-                "left": left_expression,
-                "operation": operation,
-                "right": right_expression
-            }
+        tokens = self.tokens
+        while tokens.has_next():
+            token = tokens.peek()
+            power = BINDING_POWERS.get(token.type)
+            if power is None or power <= min_power:
+                break
+            tokens.next()
+            right_expression = self.binary(power)
+            left_expression = BinaryExpression(token.line, left_expression, token.raw, right_expression)
         return left_expression
 
     def unary(self):
         if self.tokens.has_next() and self.tokens.peek().match(TokenType.NOT, TokenType.MINUS):
+            line = self.tokens.peek().line
             operation = self.tokens.peek().raw
             self.tokens.next()
             right_expression = self.unary()
-            return {
-                "type": NodeType.UNARY_EXPRESSION,
-                "operation": operation,
-                "right": right_expression
-            }
+            return UnaryExpression(line, operation, right_expression)
         return self.primary()
 
     def primary(self):
@@ -376,48 +471,65 @@ class Parser:
         token = self.tokens.peek()
         if token.match(TokenType.INTEGER):
             self.tokens.next()
-            return {
-                "type": NodeType.INTEGER_LITERAL,
-                "value": int(token.raw)
-            }
+            return IntegerLiteral(token.line, int(token.raw))
         elif token.match(TokenType.STRING):
             self.tokens.next()
-            return {
-                "type": NodeType.STRING_LITERAL,
-                "value": token.raw
-            }
+            return StringLiteral(token.line, token.raw)
         elif token.match(TokenType.DOUBLE):
             self.tokens.next()
-            return {
-                "type": NodeType.DOUBLE_LITERAL,
-                "value": token.raw
-            }
+            return DoubleLiteral(token.line, token.raw)
+        elif token.match(TokenType.OPEN_BRACKET):
+            return self.parse_index(self.parse_list_literal())
         elif token.match(TokenType.ID):
             identifier = self.parse_id()
             if self.tokens.peek().match(TokenType.OPEN_PARAM):
                 function_call = self.parse_function_call(identifier)
                 self.tokens.next()
-                return function_call
-            return identifier
+                return self.parse_index(function_call)
+            return self.parse_index(identifier)
         else:
             raise LoomSyntaxError(f"Invalid literal '{token.raw}'", token)
 
+    def parse_list_literal(self):
+        line = self.tokens.peek().line
+        values = list()
+        self.tokens.next()
+        while not self.tokens.peek().match(TokenType.CLOSE_BRACKET):
+            values.append(self.binary())
+            if not self.tokens.peek().match(TokenType.CLOSE_BRACKET):
+                self.tokens.peek().expect(TokenType.COMMA)
+                self.tokens.next()
+        self.tokens.next()
+        # without a declared type the elements decide, [1, 2.5] is a list<double>
+        element_types = {self.get_type(value) for value in values}
+        if element_types == {"integer", "double"}:
+            element_types = {"double"}
+        data_type = None
+        if len(element_types) == 1 and None not in element_types:
+            data_type = f"list<{element_types.pop()}>"
+        literal = ListLiteral(line, None, values)
+        self.set_type(literal, data_type)
+        return literal
+
+    def parse_index(self, target):
+        while self.tokens.has_next() and self.tokens.peek().match(TokenType.OPEN_BRACKET):
+            line = self.tokens.peek().line
+            self.tokens.next()
+            index = self.binary()
+            self.tokens.peek().expect(TokenType.CLOSE_BRACKET)
+            self.tokens.next()
+            target = IndexExpression(line, target, index)
+        return target
+
     def parse_id(self):
         token = self.tokens.peek()
         if self.tokens.has_next() and self.tokens.peek(1).match(TokenType.DOT):
             self.tokens.next().expect(TokenType.DOT)
             self.tokens.next()
-            return {
-                "type": NodeType.MEMBERSHIP_EXPRESSION,
-                "name": token.raw,
-                "property": self.parse_id()
-            }
+            return MembershipExpression(token.line, token.raw, self.parse_id())
         elif token.match(TokenType.ID):
             self.tokens.next()
-            return {
-                "type": NodeType.IDENTITY,
-                "name": token.raw
-            }
+            return Identity(token.line, token.raw)
         else:
             raise LoomSyntaxError("Invalid expression", self.tokens.peek())
 
@@ -0,0 +1,163 @@
+from lang.utils.ast_node import NodeType, walk, get_local_types, Identity, CallExpression, \
+    SelectorExpression, AssignmentExpression, VariableDeclaration, BlockStatement
+
+def get_pieces(statement, name):
+    # the strings `name += a` or `name = name + a + b` appends, None for anything else
+    if statement.type != NodeType.ASSIGNMENT_EXPRESSION or statement.left.type != NodeType.IDENTITY \
+            or statement.left.name != name:
+        return None
+    if statement.operation == "+=":
+        return [statement.right]
+    if statement.operation != "=":
+        return None
+    pieces = list()
+    expression = statement.right
+    while expression.type == NodeType.BINARY_EXPRESSION and expression.operation == "+":
+        pieces.append(expression.right)
+        expression = expression.left
+    if not pieces or expression.type != NodeType.IDENTITY or expression.name != name:
+        return None
+    return list(reversed(pieces))
+
+def get_statements(statements):
+    # every statement in statements and in the bodies nested below them
+    for statement in statements:
+        yield statement
+        _type = statement.type
+        if _type == NodeType.IF_STATEMENT:
+            yield from get_statements([statement.consequent])
+            if statement.alternate is not None:
+                yield from get_statements([statement.alternate])
+        elif _type == NodeType.WHILE_STATEMENT:
+            yield from get_statements([statement.body])
+        elif _type == NodeType.BLOCK_STATEMENT:
+            yield from get_statements(statement.body)
+        elif _type == NodeType.SWITCH_STATEMENT:
+            for case in statement.cases:
+                yield from get_statements(case.body)
+            if statement.default is not None:
+                yield from get_statements(statement.default)
+
+class StringBuilders:
+    # A string variable a while loop only ever appends to (`s += x` or
+    # `s = s + x`) is collected in a strings.Builder instead of being copied
+    # on every iteration. The builder starts from the value the variable has
+    # ahead of the loop and the variable is assigned the result right after
+    # it, which is the first place it can be read again.
+    def __init__(self, program):
+        self.program = program
+        self.builders = 0
+        self.types = dict()
+        self.counter = 0
+
+    def run(self):
+        for declaration in self.program['body']:
+            if declaration.type == NodeType.FUNCTION_DECLARATION:
+                self.types = get_local_types(declaration)
+                self.counter = 0
+                declaration.body = self.rewrite_statements(declaration.body)
+        if self.builders:
+            self.program['imports'].add("strings")
+        return self.program
+
+    def report(self):
+        return f"[BUILDERS] {self.builders} string accumulation(s) moved to strings.Builder"
+
+    def rewrite_statements(self, statements):
+        rewritten = list()
+        for statement in statements:
+            rewritten.extend(self.rewrite_statement(statement))
+        return rewritten
+
+    def rewrite_nested(self, statement):
+        rewritten = self.rewrite_statements([statement])
+        if len(rewritten) == 1:
+            return rewritten[0]
+        return BlockStatement(statement.line, rewritten)
+
+    def rewrite_statement(self, statement):
+        _type = statement.type
+        if _type == NodeType.WHILE_STATEMENT:
+            prologue, epilogue, builders = list(), list(), dict()
+            for name in self.get_accumulated(statement):
+                self.counter += 1
+                self.builders += 1
+                builder = f"{name}__sb{self.counter}"
+                builders[name] = builder
+                line = statement.line
+                prologue.append(VariableDeclaration(line, "strings.Builder", builder, None))
+                prologue.append(self.write(line, builder, Identity(line, name)))
+                epilogue.append(AssignmentExpression(line, Identity(line, name), "=", CallExpression(
+                    line, SelectorExpression(line, Identity(line, builder), "String"), [])))
+            if builders:
+                statement.body = self.write_nested(statement.body, builders)
+            statement.body = self.rewrite_nested(statement.body)
+            return prologue + [statement] + epilogue
+        elif _type == NodeType.IF_STATEMENT:
+            statement.consequent = self.rewrite_nested(statement.consequent)
+            if statement.alternate is not None:
+                statement.alternate = self.rewrite_nested(statement.alternate)
+        elif _type == NodeType.BLOCK_STATEMENT:
+            statement.body = self.rewrite_statements(statement.body)
+        elif _type == NodeType.SWITCH_STATEMENT:
+            for case in statement.cases:
+                case.body = self.rewrite_statements(case.body)
+            if statement.default is not None:
+                statement.default = self.rewrite_statements(statement.default)
+        return [statement]
+
+    def get_accumulated(self, loop):
+        # string variables the loop appends to and never reads or declares
+        appends = dict()
+        for statement in get_statements([loop.body]):
+            if statement.type in {NodeType.VARIABLE_DECLARATION, NodeType.CONSTANTS_DECLARATION}:
+                appends[statement.variable] = None
+            elif statement.type == NodeType.ASSIGNMENT_EXPRESSION and statement.left.type == NodeType.IDENTITY:
+                name = statement.left.name
+                if self.types.get(name) == "string" and appends.get(name, 0) is not None:
+                    pieces = get_pieces(statement, name)
+                    if pieces is not None:
+                        # the target plus the `s` of `s = s + x`
+                        appends[name] = appends.get(name, 0) + (1 if statement.operation == "+=" else 2)
+        uses = dict()
+        for node in walk([loop.test, loop.body]):
+            if node.type == NodeType.IDENTITY and node.name in appends:
+                uses[node.name] = uses.get(node.name, 0) + 1
+        return [name for name, count in appends.items() if count and uses.get(name) == count]
+
+    def write(self, line, builder, piece):
+        return CallExpression(line, SelectorExpression(line, Identity(line, builder), "WriteString"), [piece])
+
+    def write_statements(self, statements, builders):
+        written = list()
+        for statement in statements:
+            written.extend(self.write_statement(statement, builders))
+        return written
+
+    def write_nested(self, statement, builders):
+        written = self.write_statements([statement], builders)
+        if len(written) == 1:
+            return written[0]
+        return BlockStatement(statement.line, written)
+
+    def write_statement(self, statement, builders):
+        _type = statement.type
+        if _type == NodeType.ASSIGNMENT_EXPRESSION and statement.left.type == NodeType.IDENTITY \
+                and statement.left.name in builders:
+            builder = builders[statement.left.name]
+            return [self.write(piece.line, builder, piece)
+                    for piece in get_pieces(statement, statement.left.name)]
+        elif _type == NodeType.IF_STATEMENT:
+            statement.consequent = self.write_nested(statement.consequent, builders)
+            if statement.alternate is not None:
+                statement.alternate = self.write_nested(statement.alternate, builders)
+        elif _type == NodeType.WHILE_STATEMENT:
+            statement.body = self.write_nested(statement.body, builders)
+        elif _type == NodeType.BLOCK_STATEMENT:
+            statement.body = self.write_statements(statement.body, builders)
+        elif _type == NodeType.SWITCH_STATEMENT:
+            for case in statement.cases:
+                case.body = self.write_statements(case.body, builders)
+            if statement.default is not None:
+                statement.default = self.write_statements(statement.default, builders)
+        return [statement]
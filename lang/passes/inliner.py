@@ -0,0 +1,281 @@
+from lang.utils.ast_node import NodeType, Node, walk, get_assigned_name, get_callee_name, Identity, \
+    CallExpression, AssignmentExpression, VariableDeclaration, BlockStatement
+from lang.passes.reachability import CallGraph
+from lang.passes.types import is_untyped
+
+# Statements a straight-line body may hold next to its final return
+STRAIGHT_LINE = {
+    NodeType.VARIABLE_DECLARATION,
+    NodeType.CONSTANTS_DECLARATION,
+    NodeType.ASSIGNMENT_EXPRESSION,
+    NodeType.CALL_EXPRESSION
+}
+
+CONVERSIONS = {"integer": "int64", "double": "float64"}
+
+def is_simple(expression):
+    # evaluating it has no effects, so it can be copied or dropped freely
+    return expression.type in {NodeType.INTEGER_LITERAL, NodeType.DOUBLE_LITERAL,
+                               NodeType.STRING_LITERAL, NodeType.IDENTITY}
+
+def has_call(expression):
+    return any(node.type == NodeType.CALL_EXPRESSION for node in walk(expression))
+
+def count_uses(node, name):
+    return sum(1 for child in walk(node) if child.type == NodeType.IDENTITY and child.name == name)
+
+def get_kind(expression):
+    types = {node.type for node in walk(expression)}
+    if NodeType.DOUBLE_LITERAL in types:
+        return "double"
+    elif NodeType.STRING_LITERAL in types:
+        return "string"
+    return "integer"
+
+def typed(expression, data_type, sibling=None):
+    # An untyped constant standing in for a typed parameter or result must
+    # keep that type where Go would otherwise do constant arithmetic with it,
+    # which is only the case when the other operand is untyped as well
+    if data_type not in CONVERSIONS or not is_untyped(expression):
+        return expression
+    if sibling is not None and get_kind(expression) == data_type and not is_untyped(sibling):
+        return expression
+    return CallExpression(expression.line, Identity(expression.line, CONVERSIONS[data_type]), [expression])
+
+def substitute(node, mapping, types):
+    # Deep copy of node where every Identity found in mapping is replaced by a
+    # copy of its expression, types holds the parameter type of those
+    # replacements and locals declared inside node are renamed through mapping
+    if isinstance(node, list):
+        return [substitute(item, mapping, types) for item in node]
+    if not isinstance(node, Node):
+        return node
+    _type = node.type
+    if _type == NodeType.IDENTITY:
+        if node.name in mapping:
+            return substitute(mapping[node.name], {}, {})
+        return Identity(node.line, node.name)
+    elif _type == NodeType.MEMBERSHIP_EXPRESSION:
+        return node.__class__(node.line, node.name, substitute(node.property, {}, {}))
+    elif _type in {NodeType.VARIABLE_DECLARATION, NodeType.CONSTANTS_DECLARATION}:
+        variable = mapping[node.variable].name if node.variable in mapping else node.variable
+        return node.__class__(node.line, node.data_type, variable, substitute(node.expression, mapping, types))
+    copy = node.__class__(node.line, *[substitute(getattr(node, field), mapping, types) for field in node.fields])
+    if _type == NodeType.BINARY_EXPRESSION:
+        left, right = copy.left, copy.right
+        if node.left.type == NodeType.IDENTITY and node.left.name in types:
+            copy.left = typed(left, types[node.left.name], right)
+        if node.right.type == NodeType.IDENTITY and node.right.name in types:
+            copy.right = typed(right, types[node.right.name], left)
+    elif _type == NodeType.UNARY_EXPRESSION:
+        if node.right.type == NodeType.IDENTITY and node.right.name in types:
+            copy.right = typed(copy.right, types[node.right.name])
+    return copy
+
+class Inliner:
+    # Replaces calls to small non recursive functions with their bodies. A
+    # body made of a single return is inlined wherever the call appears, a
+    # short straight-line body only where the call is a whole statement, the
+    # initialiser of a var, the right side of an assignment or a return value.
+    def __init__(self, program, max_size=16, max_depth=2):
+        self.program = program
+        self.max_size = max_size
+        self.max_depth = max_depth
+        self.inlined = dict() # callee -> inlined call sites
+        self.candidates = dict()
+        self.counters = dict() # caller -> temporaries made so far
+        self.caller = None
+
+    def run(self):
+        # every round inlines one more level of calls, with the bodies and
+        # sizes left by the round before
+        for _ in range(self.max_depth):
+            self.candidates = self.get_candidates()
+            inlined = sum(self.inlined.values())
+            for declaration in self.program['body']:
+                if declaration.type == NodeType.FUNCTION_DECLARATION:
+                    self.caller = declaration.name
+                    declaration.body = self.inline_statements(declaration.body)
+            if sum(self.inlined.values()) == inlined:
+                break
+        return self.program
+
+    def report(self):
+        lines = [f"[INLINER] inlined {sum(self.inlined.values())} call(s)"]
+        for name, count in self.inlined.items():
+            lines.append(f"    {name}: {count}")
+        return "\n".join(lines)
+
+    def get_candidates(self):
+        graph = CallGraph(self.program)
+        candidates = dict()
+        for name, function in graph.functions.items():
+            body = function.body
+            if name == "main__" or not body or sum(1 for _ in walk(body)) > self.max_size:
+                continue
+            if name in graph.reachable(graph.get_callees(name)):
+                continue # recursive
+            *statements, last = body
+            if last.type != NodeType.RETURN_DECLARATION:
+                statements.append(last)
+            if all(statement.type in STRAIGHT_LINE for statement in statements):
+                candidates[name] = function
+        return candidates
+
+    def get_candidate(self, expression):
+        if expression.type != NodeType.CALL_EXPRESSION:
+            return None
+        function = self.candidates.get(get_callee_name(expression))
+        if function is None or function.name == self.caller or len(function.params) != len(expression.arguments):
+            return None
+        return function
+
+    def is_return_only(self, function):
+        return len(function.body) == 1 and function.body[0].type == NodeType.RETURN_DECLARATION
+
+    def new_name(self, name):
+        count = self.counters.get(self.caller, 0) + 1
+        self.counters[self.caller] = count
+        return f"{name}__inl{count}"
+
+    def inline_statements(self, statements):
+        inlined = list()
+        for statement in statements:
+            inlined.extend(self.inline_statement(statement))
+        return inlined
+
+    def inline_nested(self, statement):
+        inlined = self.inline_statements([statement])
+        if len(inlined) == 1:
+            return inlined[0]
+        return BlockStatement(statement.line, inlined)
+
+    def inline_statement(self, statement):
+        _type = statement.type
+        if _type == NodeType.IF_STATEMENT:
+            statement.test = self.inline_expression(statement.test)
+            statement.consequent = self.inline_nested(statement.consequent)
+            if statement.alternate is not None:
+                statement.alternate = self.inline_nested(statement.alternate)
+            return [statement]
+        elif _type == NodeType.WHILE_STATEMENT:
+            # the test runs every iteration, only a single return can go there
+            statement.test = self.inline_expression(statement.test)
+            statement.body = self.inline_nested(statement.body)
+            return [statement]
+        elif _type == NodeType.BLOCK_STATEMENT:
+            statement.body = self.inline_statements(statement.body)
+            return [statement]
+        elif _type in {NodeType.VARIABLE_DECLARATION, NodeType.CONSTANTS_DECLARATION,
+                       NodeType.RETURN_DECLARATION}:
+            function = self.get_candidate(statement.expression)
+            if _type != NodeType.CONSTANTS_DECLARATION and function is not None \
+                    and not self.is_return_only(function):
+                self.inline_arguments(statement.expression)
+                prologue, statement.expression = self.inline_body(function, statement.expression)
+                return prologue + [statement]
+            statement.expression = self.inline_expression(statement.expression)
+            return [statement]
+        elif _type == NodeType.ASSIGNMENT_EXPRESSION:
+            function = self.get_candidate(statement.right)
+            if function is not None and not self.is_return_only(function):
+                self.inline_arguments(statement.right)
+                prologue, statement.right = self.inline_body(function, statement.right)
+                return prologue + [statement]
+        elif _type == NodeType.CALL_EXPRESSION:
+            function = self.get_candidate(statement)
+            if function is not None:
+                self.inline_arguments(statement)
+                prologue, result = self.inline_body(function, statement)
+                # locals only the result reads would be declared and not used without it
+                unused = {node.variable for node in prologue if node.type == NodeType.VARIABLE_DECLARATION
+                          and count_uses(prologue, node.variable) == 0}
+                if result is None or not has_call(result) and not any(
+                        node.type == NodeType.IDENTITY and node.name in unused for node in walk(result)):
+                    return prologue # an unused value without effects
+                if result.type != NodeType.CALL_EXPRESSION:
+                    result = AssignmentExpression(result.line, Identity(result.line, "_"), "=", result)
+                return prologue + [result]
+        return [self.inline_expression(statement)]
+
+    def inline_arguments(self, call):
+        call.arguments = [self.inline_expression(argument) for argument in call.arguments]
+
+    def inline_expression(self, expression):
+        _type = expression.type
+        if _type == NodeType.CALL_EXPRESSION:
+            self.inline_arguments(expression)
+            function = self.get_candidate(expression)
+            if function is not None and self.is_return_only(function):
+                inlined = self.inline_return(function, expression)
+                if inlined is not None:
+                    return inlined
+        elif _type == NodeType.BINARY_EXPRESSION:
+            left = self.get_candidate(expression.left)
+            right = self.get_candidate(expression.right)
+            expression.left = self.inline_expression(expression.left)
+            expression.right = self.inline_expression(expression.right)
+            if left is not None:
+                expression.left = typed(expression.left, left.return_type, expression.right)
+            if right is not None:
+                expression.right = typed(expression.right, right.return_type, expression.left)
+        elif _type == NodeType.UNARY_EXPRESSION:
+            function = self.get_candidate(expression.right)
+            expression.right = self.inline_expression(expression.right)
+            if function is not None:
+                expression.right = typed(expression.right, function.return_type)
+        elif _type == NodeType.ASSIGNMENT_EXPRESSION:
+            expression.right = self.inline_expression(expression.right)
+        return expression
+
+    def inline_return(self, function, call):
+        # Go only orders calls, so an argument with a call may move into the
+        # body when it is used exactly once there, in parameter order, and
+        # the body has no calls of its own it could be reordered against
+        result = function.body[0].expression
+        mapping, types = dict(), dict()
+        for (name, data_type), argument in zip(function.params, call.arguments):
+            if not is_simple(argument):
+                uses = count_uses(result, name)
+                if uses > 1 or (has_call(argument) and (uses == 0 or has_call(result))):
+                    return None
+            mapping[name] = argument
+            types[name] = data_type
+        order = [node.name for node in walk(result)
+                 if node.type == NodeType.IDENTITY and node.name in mapping and has_call(mapping[node.name])]
+        if order != [name for name, _ in function.params if name in order]:
+            return None
+        self.inlined[function.name] = self.inlined.get(function.name, 0) + 1
+        return substitute(result, mapping, types)
+
+    def inline_body(self, function, call):
+        # returns the statements replacing the call and the expression of its
+        # result, None for a body without return. Arguments with effects are
+        # evaluated first, in order, into temporaries named after the parameter
+        prologue = list()
+        mapping, types = dict(), dict()
+        assigned = {get_assigned_name(node.left) for node in walk(function.body)
+                    if node.type == NodeType.ASSIGNMENT_EXPRESSION}
+        for (name, data_type), argument in zip(function.params, call.arguments):
+            if count_uses(function.body, name) == 0:
+                if argument.type == NodeType.CALL_EXPRESSION:
+                    prologue.append(argument)
+                elif has_call(argument):
+                    prologue.append(AssignmentExpression(argument.line, Identity(argument.line, "_"),
+                                                         "=", argument))
+            elif name not in assigned and is_simple(argument):
+                mapping[name] = argument
+                types[name] = data_type
+            else:
+                temporary = self.new_name(name)
+                prologue.append(VariableDeclaration(call.line, data_type, temporary, argument))
+                mapping[name] = Identity(call.line, temporary)
+        for node in walk(function.body):
+            if node.type in {NodeType.VARIABLE_DECLARATION, NodeType.CONSTANTS_DECLARATION}:
+                mapping[node.variable] = Identity(node.line, self.new_name(node.variable))
+        body = substitute(function.body, mapping, types)
+        result = None
+        if body[-1].type == NodeType.RETURN_DECLARATION:
+            result = body.pop().expression
+        self.inlined[function.name] = self.inlined.get(function.name, 0) + 1
+        return prologue + body, result
@@ -0,0 +1,172 @@
+from lang.utils.ast_node import NodeType, Node, walk, get_assigned_name, get_callee_name, \
+    Identity, VariableDeclaration, BlockStatement
+from lang.utils.builtins import get_builtin
+
+# Operators that can not panic whatever their (well typed) operands are
+SAFE_OPERATIONS = {"+", "-", "*", "==", "!=", "<", ">", "<=", ">=", "&&", "||", "!", "|", "<<"}
+
+def get_key(node):
+    # structural identity, equal keys are the same computation
+    if isinstance(node, list):
+        return tuple(get_key(item) for item in node)
+    if not isinstance(node, Node):
+        return node
+    return (node.type,) + tuple(get_key(getattr(node, field)) for field in node.fields)
+
+def get_variant(loop):
+    # names the loop may change: assignment targets, lists it stores into
+    # and its own declarations
+    variant = set()
+    for node in walk(loop):
+        if node.type == NodeType.ASSIGNMENT_EXPRESSION:
+            variant.add(get_assigned_name(node.left))
+        elif node.type in {NodeType.VARIABLE_DECLARATION, NodeType.CONSTANTS_DECLARATION}:
+            variant.add(node.variable)
+    return variant
+
+class LoopInvariants:
+    # Loop invariant code motion for while loops. A subexpression that only
+    # reads variables the loop never assigns or declares, and only uses
+    # operators and builtins that are pure and can not panic, is computed
+    # once into a temporary declared right before the `for`. Not panicking
+    # matters as the temporary is evaluated even when the loop body (or the
+    # branch the expression sat in) never runs.
+    def __init__(self, program):
+        self.program = program
+        self.functions = {declaration.name for declaration in program['body']
+                          if declaration.type == NodeType.FUNCTION_DECLARATION}
+        self.hoisted = 0
+        self.counter = 0
+
+    def run(self):
+        for declaration in self.program['body']:
+            if declaration.type == NodeType.FUNCTION_DECLARATION:
+                self.counter = 0
+                declaration.body = self.rewrite_statements(declaration.body)
+        return self.program
+
+    def report(self):
+        return f"[LICM] hoisted {self.hoisted} loop invariant expression(s)"
+
+    def rewrite_statements(self, statements):
+        rewritten = list()
+        for statement in statements:
+            rewritten.extend(self.rewrite_statement(statement))
+        return rewritten
+
+    def rewrite_nested(self, statement):
+        rewritten = self.rewrite_statements([statement])
+        if len(rewritten) == 1:
+            return rewritten[0]
+        return BlockStatement(statement.line, rewritten)
+
+    def rewrite_statement(self, statement):
+        # outer loops first, what is invariant there leaves the inner loops too
+        _type = statement.type
+        prologue = list()
+        if _type == NodeType.WHILE_STATEMENT:
+            temporaries = dict() # key -> temporary name
+            self.hoist_statement(statement, get_variant(statement), temporaries, prologue)
+            statement.body = self.rewrite_nested(statement.body)
+        elif _type == NodeType.IF_STATEMENT:
+            statement.consequent = self.rewrite_nested(statement.consequent)
+            if statement.alternate is not None:
+                statement.alternate = self.rewrite_nested(statement.alternate)
+        elif _type == NodeType.BLOCK_STATEMENT:
+            statement.body = self.rewrite_statements(statement.body)
+        elif _type == NodeType.SWITCH_STATEMENT:
+            for case in statement.cases:
+                case.body = self.rewrite_statements(case.body)
+            if statement.default is not None:
+                statement.default = self.rewrite_statements(statement.default)
+        return prologue + [statement]
+
+    def hoist_statement(self, statement, variant, temporaries, prologue):
+        _type = statement.type
+        arguments = (variant, temporaries, prologue)
+        if _type in {NodeType.VARIABLE_DECLARATION, NodeType.CONSTANTS_DECLARATION,
+                     NodeType.RETURN_DECLARATION}:
+            if statement.expression is not None and _type != NodeType.CONSTANTS_DECLARATION:
+                statement.expression = self.hoist(statement.expression, *arguments)
+        elif _type == NodeType.IF_STATEMENT:
+            statement.test = self.hoist(statement.test, *arguments)
+            self.hoist_statement(statement.consequent, *arguments)
+            if statement.alternate is not None:
+                self.hoist_statement(statement.alternate, *arguments)
+        elif _type == NodeType.WHILE_STATEMENT:
+            if statement.test is not None:
+                statement.test = self.hoist(statement.test, *arguments)
+            self.hoist_statement(statement.body, *arguments)
+        elif _type == NodeType.BLOCK_STATEMENT:
+            for child in statement.body:
+                self.hoist_statement(child, *arguments)
+        elif _type == NodeType.SWITCH_STATEMENT:
+            statement.test = self.hoist(statement.test, *arguments)
+            for case in statement.cases:
+                for child in case.body:
+                    self.hoist_statement(child, *arguments)
+            for child in statement.default or ():
+                self.hoist_statement(child, *arguments)
+        else:
+            # an expression statement keeps its own value, only its parts move
+            self.hoist_children(statement, *arguments)
+
+    def hoist(self, expression, variant, temporaries, prologue):
+        if not self.is_invariant(expression, variant) or not self.is_worth(expression):
+            self.hoist_children(expression, variant, temporaries, prologue)
+            return expression
+        key = get_key(expression)
+        if key not in temporaries:
+            self.counter += 1
+            self.hoisted += 1
+            temporaries[key] = f"invariant__licm{self.counter}"
+            prologue.append(VariableDeclaration(expression.line, "", temporaries[key], expression))
+        return Identity(expression.line, temporaries[key])
+
+    def hoist_children(self, expression, variant, temporaries, prologue):
+        arguments = (variant, temporaries, prologue)
+        _type = expression.type
+        if _type == NodeType.BINARY_EXPRESSION:
+            expression.left = self.hoist(expression.left, *arguments)
+            expression.right = self.hoist(expression.right, *arguments)
+        elif _type in {NodeType.UNARY_EXPRESSION, NodeType.ASSIGNMENT_EXPRESSION}:
+            expression.right = self.hoist(expression.right, *arguments)
+        elif _type == NodeType.CALL_EXPRESSION:
+            expression.arguments = [self.hoist(argument, *arguments) for argument in expression.arguments]
+        elif _type == NodeType.INDEX_EXPRESSION:
+            expression.target = self.hoist(expression.target, *arguments)
+            expression.index = self.hoist(expression.index, *arguments)
+
+    def is_invariant(self, expression, variant):
+        for node in walk(expression):
+            _type = node.type
+            if _type == NodeType.IDENTITY:
+                if node.name in variant:
+                    return False
+            elif _type == NodeType.BINARY_EXPRESSION:
+                if node.operation == "/":
+                    # only a literal divisor is known not to be zero
+                    if node.right.type not in {NodeType.INTEGER_LITERAL, NodeType.DOUBLE_LITERAL} \
+                            or float(node.right.value) == 0:
+                        return False
+                elif node.operation not in SAFE_OPERATIONS:
+                    return False
+            elif _type == NodeType.UNARY_EXPRESSION:
+                if node.operation not in SAFE_OPERATIONS:
+                    return False
+            elif _type == NodeType.CALL_EXPRESSION:
+                name = get_callee_name(node)
+                builtin = None if name is None else get_builtin(name, self.functions)
+                if builtin is None or not builtin.pure or builtin.panics:
+                    return False
+            elif _type not in {NodeType.INTEGER_LITERAL, NodeType.DOUBLE_LITERAL, NodeType.STRING_LITERAL}:
+                return False
+        return True
+
+    def is_worth(self, expression):
+        # a computation that reads a variable, constants are folded by Go
+        if expression.type not in {NodeType.BINARY_EXPRESSION, NodeType.UNARY_EXPRESSION,
+                                   NodeType.CALL_EXPRESSION}:
+            return False
+        callees = {id(node.callee) for node in walk(expression) if node.type == NodeType.CALL_EXPRESSION}
+        return any(node.type == NodeType.IDENTITY and id(node) not in callees for node in walk(expression))
@@ -0,0 +1,84 @@
+from lang.utils.ast_node import NodeType, walk, get_callee_name, MemoDeclaration
+from lang.utils.builtins import get_builtin
+from lang.passes.reachability import CallGraph
+
+# Parameter and result types a cache can key on and hold
+MEMO_TYPES = {"integer", "string", "double"}
+
+def get_pure_functions(program):
+    # Functions whose result only depends on their arguments: no impure
+    # builtin, no Go method and no call to a function that is not pure
+    # itself. Panicking is fine, a panic is never cached.
+    graph = CallGraph(program)
+    pure = set(graph.functions)
+    changed = True
+    while changed:
+        changed = False
+        for name in sorted(pure):
+            for node in walk(graph.functions[name].body):
+                if node.type != NodeType.CALL_EXPRESSION:
+                    continue
+                callee = get_callee_name(node)
+                if callee in graph.functions:
+                    if callee in pure:
+                        continue
+                else:
+                    builtin = None if callee is None else get_builtin(callee, graph.functions)
+                    if builtin is not None and builtin.pure:
+                        continue
+                pure.discard(name)
+                changed = True
+                break
+    return pure
+
+class Memoizer:
+    # Puts a cache in front of every pure recursive function with integer,
+    # string or double parameters and result, so recursion like fib's only
+    # computes each argument once. The function keeps its name for the
+    # wrapper, its body moves to name__impl and the recursive calls inside go
+    # through the cache. size bounds the cache to a direct mapped array of
+    # that many slots, a colliding result replaces the older one; 0 keeps
+    # every result in a map. The caches are not safe for goroutines, a
+    # program that spawns is left alone.
+    def __init__(self, program, size=4096):
+        self.program = program
+        self.size = size
+        self.memoized = list()
+        self.spawns = False
+
+    def run(self):
+        self.spawns = any(node.type == NodeType.SPAWN_STATEMENT for declaration in self.program['body']
+                          if declaration.type == NodeType.FUNCTION_DECLARATION
+                          for node in walk(declaration.body))
+        if self.spawns:
+            return self.program
+        graph = CallGraph(self.program)
+        pure = get_pure_functions(self.program)
+        body = list()
+        for declaration in self.program['body']:
+            if declaration.type == NodeType.FUNCTION_DECLARATION and self.is_candidate(declaration, graph, pure):
+                body.append(MemoDeclaration(declaration.line, declaration.name, declaration.return_type,
+                                            list(declaration.params), self.size))
+                self.memoized.append(declaration.name)
+                declaration.name = f"{declaration.name}__impl"
+            body.append(declaration)
+        self.program['body'] = body
+        if any(data_type == "double" for memo in body if memo.type == NodeType.MEMO_DECLARATION
+               for _, data_type in memo.params):
+            self.program['imports'].add("math")
+        return self.program
+
+    def report(self):
+        lines = [f"[MEMOIZE] cached {len(self.memoized)} pure recursive function(s)"]
+        if self.spawns:
+            lines[0] += ", the program spawns goroutines"
+        for name in self.memoized:
+            lines.append(f"    {name}")
+        return "\n".join(lines)
+
+    def is_candidate(self, function, graph, pure):
+        name = function.name
+        return (name in pure and name != "main__" and function.params
+                and function.return_type in MEMO_TYPES
+                and all(data_type in MEMO_TYPES for _, data_type in function.params)
+                and name in graph.reachable(graph.get_callees(name)))
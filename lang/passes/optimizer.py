@@ -0,0 +1,386 @@
+from fractions import Fraction
+
+from lang.utils.ast_node import NodeType, walk, BlockStatement, IntegerLiteral, DoubleLiteral, \
+    StringLiteral, CallExpression, Identity
+
+# Transform name -> lowest opt level (-O) that enables it
+TRANSFORMS = {
+    "fold-constants": 1,
+    "prune-branches": 1,
+    "drop-unreachable": 1,
+    "propagate-constants": 2,
+    "specialize-builtins": 1,
+    "inline-functions": 2,
+    "lower-switches": 2,
+    "string-builders": 2,
+    "hoist-invariants": 2,
+    "memoize-recursion": 2
+}
+
+# Tunable limits of the transforms, set with --param name=value
+PARAMS = {
+    "inline-size": 16, # nodes in the body of an inlined function
+    "inline-depth": 2, # levels of calls inlined into each other
+    "memo-size": 4096 # slots of a memoized function's cache, 0 for an unbounded map
+}
+
+DEFAULT_LEVEL = 1
+
+# The transforms Optimizer itself carries out
+FOLDING = ("fold-constants", "prune-branches", "drop-unreachable", "propagate-constants")
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+def get_transforms(level, flags=()):
+    # flags are gcc style transform names, "no-<name>" disables one
+    enabled = {name for name, lowest in TRANSFORMS.items() if level >= lowest}
+    for flag in flags:
+        name = flag[3:] if flag.startswith("no-") else flag
+        if name not in TRANSFORMS:
+            raise ValueError(f"Unknown optimisation '{flag}'")
+        if flag.startswith("no-"):
+            enabled.discard(name)
+        else:
+            enabled.add(name)
+    return enabled
+
+def get_params(values=()):
+    params = dict(PARAMS)
+    for value in values:
+        name, _, number = value.partition("=")
+        if name not in PARAMS or not number.isdigit():
+            raise ValueError(f"Invalid param '{value}', expected one of {', '.join(PARAMS)} as name=number")
+        params[name] = int(number)
+    return params
+
+class TypedInteger(CallExpression):
+    # int64(value), what a propagated integer const stands for next to an
+    # untyped constant: Go evaluates n / 2.0 with a typed n as 7 / 2 and an
+    # untyped 7 / 2.0 as 3.5. Anywhere else it is the same as the bare
+    # literal and gets unwrapped (see Optimizer.optimize_expression).
+    __slots__ = ()
+
+def make_typed_integer(line, value):
+    return TypedInteger(line, Identity(line, "int64"), [IntegerLiteral(line, value)])
+
+def count_nodes(node):
+    return sum(1 for _ in walk(node))
+
+def terminates(statement):
+    _type = statement.type
+    if _type == NodeType.RETURN_DECLARATION:
+        return True
+    elif _type == NodeType.BLOCK_STATEMENT:
+        return len(statement.body) > 0 and terminates(statement.body[-1])
+    elif _type == NodeType.IF_STATEMENT:
+        return (statement.alternate is not None and terminates(statement.consequent)
+                and terminates(statement.alternate))
+    elif _type == NodeType.WHILE_STATEMENT:
+        return statement.test is None # `for {}` and there is no break
+    elif _type == NodeType.SWITCH_STATEMENT:
+        bodies = [case.body for case in statement.cases] + [statement.default]
+        return statement.default is not None and all(body and terminates(body[-1]) for body in bodies)
+    return False
+
+def get_untyped(expression):
+    return expression.arguments[0] if isinstance(expression, TypedInteger) else expression
+
+def to_decimal(value):
+    # exact decimal spelling of a Fraction, None when it has none
+    denominator, twos, fives = value.denominator, 0, 0
+    while denominator % 2 == 0:
+        denominator //= 2
+        twos += 1
+    while denominator % 5 == 0:
+        denominator //= 5
+        fives += 1
+    if denominator != 1:
+        return None
+    places = max(twos, fives, 1)
+    scaled = abs(value.numerator * 10 ** places // value.denominator)
+    digits = str(scaled).rjust(places + 1, "0")
+    sign = "-" if value < 0 else ""
+    return f"{sign}{digits[:-places]}.{digits[-places:]}"
+
+class Optimizer:
+    # AST level constant folding, constant propagation and dead code removal.
+    # Constants are evaluated exactly like Go evaluates untyped constant
+    # expressions: integers and doubles with arbitrary precision, and a
+    # result is only folded when Go can spell it as the same literal.
+    def __init__(self, program, transforms):
+        self.program = program
+        self.transforms = transforms
+        self.eliminated = {name: 0 for name in sorted(transforms) if name in FOLDING}
+
+    def run(self):
+        for declaration in self.program['body']:
+            if declaration.type == NodeType.FUNCTION_DECLARATION:
+                scope = {name: None for name, _ in declaration.params}
+                declaration.body = self.optimize_statements(declaration.body, [scope])
+        return self.program
+
+    def report(self):
+        lines = [f"[OPTIMIZER] eliminated {sum(self.eliminated.values())} node(s)"]
+        for name, count in self.eliminated.items():
+            lines.append(f"    {name}: {count}")
+        return "\n".join(lines)
+
+    def optimize_statements(self, statements, scopes):
+        optimized = list()
+        for index, statement in enumerate(statements):
+            optimized.extend(self.optimize_statement(statement, scopes))
+            if ("drop-unreachable" in self.transforms and optimized and terminates(optimized[-1])
+                    and index + 1 < len(statements)):
+                self.eliminated["drop-unreachable"] += sum(
+                    count_nodes(unreachable) for unreachable in statements[index + 1:])
+                break
+        return optimized
+
+    def optimize_nested(self, statement, scopes):
+        # bodies of if/while get their own scope, like the Go blocks they become
+        optimized = self.optimize_statements([statement], scopes + [dict()])
+        if len(optimized) == 1:
+            return optimized[0]
+        return BlockStatement(statement.line, optimized)
+
+    def optimize_statement(self, statement, scopes):
+        _type = statement.type
+        if _type in {NodeType.VARIABLE_DECLARATION, NodeType.CONSTANTS_DECLARATION}:
+            statement.expression = self.optimize_expression(statement.expression, scopes)
+            literal = None
+            if _type == NodeType.CONSTANTS_DECLARATION and "propagate-constants" in self.transforms:
+                literal = self.get_typed_literal(statement.expression, statement.data_type)
+            scopes[-1][statement.variable] = literal
+            if literal is not None:
+                self.eliminated["propagate-constants"] += count_nodes(statement) - 1
+                return []
+            return [statement]
+        elif _type == NodeType.RETURN_DECLARATION:
+            statement.expression = self.optimize_expression(statement.expression, scopes)
+            return [statement]
+        elif _type == NodeType.IF_STATEMENT:
+            statement.test = self.optimize_expression(statement.test, scopes)
+            test = self.get_constant(statement.test)
+            if "prune-branches" in self.transforms and test is not None and test[0] == "bool":
+                taken, pruned = statement.consequent, statement.alternate
+                if not test[1]:
+                    taken, pruned = pruned, taken
+                self.eliminated["prune-branches"] += count_nodes(statement.test) + 1
+                if pruned is not None:
+                    self.eliminated["prune-branches"] += count_nodes(pruned)
+                if taken is None:
+                    return []
+                taken = self.optimize_nested(taken, scopes)
+                if taken.type != NodeType.BLOCK_STATEMENT:
+                    taken = BlockStatement(taken.line, [taken])
+                return [taken]
+            statement.consequent = self.optimize_nested(statement.consequent, scopes)
+            if statement.alternate is not None:
+                statement.alternate = self.optimize_nested(statement.alternate, scopes)
+            return [statement]
+        elif _type == NodeType.WHILE_STATEMENT:
+            statement.test = self.optimize_expression(statement.test, scopes)
+            test = self.get_constant(statement.test)
+            if "prune-branches" in self.transforms and test is not None and test[0] == "bool":
+                if not test[1]:
+                    self.eliminated["prune-branches"] += count_nodes(statement)
+                    return []
+                self.eliminated["prune-branches"] += count_nodes(statement.test)
+                statement.test = None # compiles to a bare `for {`
+            statement.body = self.optimize_nested(statement.body, scopes)
+            return [statement]
+        elif _type == NodeType.BLOCK_STATEMENT:
+            statement.body = self.optimize_statements(statement.body, scopes + [dict()])
+            return [statement]
+        elif _type == NodeType.SPAWN_STATEMENT:
+            statement.call = self.optimize_expression(statement.call, scopes)
+            return [statement]
+        elif _type == NodeType.WAIT_STATEMENT:
+            return [statement]
+        else:
+            return [self.optimize_expression(statement, scopes)]
+
+    def optimize_expression(self, expression, scopes):
+        # outside of constant expressions a typed integer is its literal
+        return get_untyped(self.optimize_operand(expression, scopes))
+
+    def optimize_operand(self, expression, scopes):
+        _type = expression.type
+        if _type == NodeType.IDENTITY:
+            if "propagate-constants" in self.transforms:
+                for scope in reversed(scopes):
+                    if expression.name in scope:
+                        literal = scope[expression.name]
+                        if literal is None:
+                            break
+                        if isinstance(literal, TypedInteger):
+                            return make_typed_integer(expression.line, literal.arguments[0].value)
+                        return literal.__class__(expression.line, literal.value)
+            return expression
+        elif _type == NodeType.BINARY_EXPRESSION:
+            expression.left = self.optimize_operand(expression.left, scopes)
+            expression.right = self.optimize_operand(expression.right, scopes)
+            folded = self.fold(expression)
+            if folded is expression:
+                # next to an operand that is not constant Go types the constant as it does the literal
+                if self.get_constant(expression.right) is None:
+                    expression.left = get_untyped(expression.left)
+                if self.get_constant(expression.left) is None:
+                    expression.right = get_untyped(expression.right)
+            return folded
+        elif _type == NodeType.UNARY_EXPRESSION:
+            expression.right = self.optimize_operand(expression.right, scopes)
+            return self.fold(expression)
+        elif _type == NodeType.ASSIGNMENT_EXPRESSION:
+            if expression.left.type == NodeType.INDEX_EXPRESSION:
+                expression.left = self.optimize_expression(expression.left, scopes)
+            expression.right = self.optimize_expression(expression.right, scopes)
+            return expression
+        elif _type == NodeType.INDEX_EXPRESSION:
+            expression.target = self.optimize_expression(expression.target, scopes)
+            expression.index = self.optimize_expression(expression.index, scopes)
+            return expression
+        elif _type == NodeType.LIST_LITERAL:
+            expression.values = [self.optimize_expression(value, scopes) for value in expression.values]
+            return expression
+        elif _type == NodeType.MAKE_EXPRESSION:
+            if expression.length is not None:
+                expression.length = self.optimize_expression(expression.length, scopes)
+            if expression.capacity is not None:
+                expression.capacity = self.optimize_expression(expression.capacity, scopes)
+            return expression
+        elif _type == NodeType.CALL_EXPRESSION:
+            expression.arguments = [self.optimize_expression(argument, scopes)
+                                    for argument in expression.arguments]
+            return expression
+        return expression
+
+    def fold(self, expression):
+        if "fold-constants" not in self.transforms:
+            return expression
+        literal = self.make_literal(expression.line, self.get_constant(expression))
+        if literal is None:
+            return expression
+        self.eliminated["fold-constants"] += count_nodes(expression) - 1
+        return literal
+
+    def get_typed_literal(self, expression, data_type):
+        # the literal a typed Go constant of data_type behaves like
+        constant = self.get_constant(expression)
+        if constant is None:
+            return None
+        kind, value = constant
+        if data_type == "integer" and kind in {"integer", "double", "int64"} and Fraction(value).denominator == 1:
+            return self.make_literal(expression.line, ("int64", int(value)))
+        elif data_type == "double" and kind in {"integer", "double"}:
+            return self.make_literal(expression.line, ("double", Fraction(value)))
+        elif data_type == "string" and kind == "string":
+            return self.make_literal(expression.line, constant)
+        return None
+
+    def make_literal(self, line, constant):
+        if constant is None:
+            return None
+        kind, value = constant
+        if kind == "integer" and INT64_MIN <= value <= INT64_MAX:
+            return IntegerLiteral(line, value)
+        elif kind == "int64" and INT64_MIN <= value <= INT64_MAX:
+            return make_typed_integer(line, value)
+        elif kind == "double":
+            decimal = to_decimal(value)
+            if decimal is not None:
+                return DoubleLiteral(line, decimal)
+        elif kind == "string":
+            return StringLiteral(line, value)
+        return None
+
+    def get_constant(self, expression):
+        # (kind, value) of a constant expression or None, doubles are Fractions
+        # and strings stay Go literals
+        _type = expression.type
+        if _type == NodeType.INTEGER_LITERAL:
+            return "integer", expression.value
+        elif _type == NodeType.DOUBLE_LITERAL:
+            return "double", Fraction(expression.value)
+        elif _type == NodeType.STRING_LITERAL:
+            return "string", expression.value
+        elif isinstance(expression, TypedInteger):
+            return "int64", expression.arguments[0].value
+        elif _type == NodeType.UNARY_EXPRESSION:
+            right = self.get_constant(expression.right)
+            if right is None:
+                return None
+            if expression.operation == "-" and right[0] in {"integer", "double", "int64"}:
+                return right[0], -right[1]
+            elif expression.operation == "!" and right[0] == "bool":
+                return "bool", not right[1]
+            return None
+        elif _type == NodeType.BINARY_EXPRESSION:
+            left = self.get_constant(expression.left)
+            right = self.get_constant(expression.right) if left is not None else None
+            if right is None:
+                return None
+            return self.get_binary_constant(expression.operation, left, right)
+        return None
+
+    def get_binary_constant(self, operation, left, right):
+        (left_kind, left_value), (right_kind, right_value) = left, right
+        numeric = {"integer", "double"}
+        if "int64" in {left_kind, right_kind}:
+            # the untyped operand converts to int64, which Go only allows
+            # for a whole number, the result overflowing is an error too
+            if not all(kind in numeric | {"int64"} and Fraction(value).denominator == 1
+                       for kind, value in (left, right)):
+                return None
+            constant = self.get_binary_constant(operation, ("integer", int(left_value)),
+                                                ("integer", int(right_value)))
+            if constant is None or constant[0] == "bool":
+                return constant
+            return ("int64", constant[1]) if INT64_MIN <= constant[1] <= INT64_MAX else None
+        if left_kind in numeric and right_kind in numeric:
+            kind = "integer" if left_kind == right_kind == "integer" else "double"
+            if kind == "double":
+                left_value, right_value = Fraction(left_value), Fraction(right_value)
+            if operation == "+":
+                return kind, left_value + right_value
+            elif operation == "-":
+                return kind, left_value - right_value
+            elif operation == "*":
+                return kind, left_value * right_value
+            elif operation == "/":
+                if right_value == 0:
+                    return None
+                if kind == "integer": # truncated towards zero like Go
+                    quotient = abs(left_value) // abs(right_value)
+                    return kind, quotient if (left_value < 0) == (right_value < 0) else -quotient
+                return kind, left_value / right_value
+            return self.get_comparison(operation, left_value, right_value)
+        elif left_kind == right_kind == "string":
+            if operation == "+":
+                return "string", left_value[:-1] + right_value[1:]
+            if operation in {"==", "!="} and "\\" not in left_value + right_value:
+                return self.get_comparison(operation, left_value, right_value)
+        elif left_kind == right_kind == "bool":
+            if operation == "&&":
+                return "bool", left_value and right_value
+            elif operation == "||":
+                return "bool", left_value or right_value
+            elif operation in {"==", "!="}:
+                return self.get_comparison(operation, left_value, right_value)
+        return None
+
+    def get_comparison(self, operation, left_value, right_value):
+        if operation == "==":
+            return "bool", left_value == right_value
+        elif operation == "!=":
+            return "bool", left_value != right_value
+        elif operation == "<":
+            return "bool", left_value < right_value
+        elif operation == ">":
+            return "bool", left_value > right_value
+        elif operation == "<=":
+            return "bool", left_value <= right_value
+        elif operation == ">=":
+            return "bool", left_value >= right_value
+        return None
@@ -0,0 +1,59 @@
+from lang.utils.ast_node import NodeType, walk, get_callee_name
+
+class CallGraph:
+    # Edges between the functions of a program, built on demand. get_body lets
+    # the caller decide how a body is obtained (Parser.parse_body for lazy ones)
+    def __init__(self, program, get_body=None):
+        self.functions = {declaration.name: declaration for declaration in program['body']
+                          if declaration.type == NodeType.FUNCTION_DECLARATION}
+        self.get_body = (lambda function: function.body) if get_body is None else get_body
+        self.edges = dict()
+
+    def get_callees(self, name):
+        if name not in self.edges:
+            callees = list()
+            for node in walk(self.get_body(self.functions[name])):
+                if node.type == NodeType.CALL_EXPRESSION:
+                    callee = get_callee_name(node)
+                    if callee in self.functions and callee not in callees:
+                        callees.append(callee)
+            self.edges[name] = callees
+        return self.edges[name]
+
+    def reachable(self, roots):
+        pending = [name for name in roots if name in self.functions]
+        reached = set(pending)
+        while pending:
+            for callee in self.get_callees(pending.pop()):
+                if callee not in reached:
+                    reached.add(callee)
+                    pending.append(callee)
+        return reached
+
+class TreeShaker:
+    # Drops every function main__ can not reach, their bodies are never parsed
+    def __init__(self, program, get_body=None, roots=("main__",)):
+        self.program = program
+        self.get_body = get_body
+        self.graph = CallGraph(program, get_body)
+        self.roots = roots
+        self.dropped = list()
+
+    def run(self):
+        # a fresh graph, other passes may have rewritten bodies since the last run
+        self.graph = CallGraph(self.program, self.get_body)
+        reached = self.graph.reachable(self.roots)
+        body = list()
+        for declaration in self.program['body']:
+            if declaration.type == NodeType.FUNCTION_DECLARATION and declaration.name not in reached:
+                self.dropped.append(declaration)
+            else:
+                body.append(declaration)
+        self.program['body'] = body
+        return self.program
+
+    def report(self):
+        lines = [f"[TREE SHAKING] dropped {len(self.dropped)} unreachable function(s)"]
+        for function in self.dropped:
+            lines.append(f"    {function.name} (line {function.line})")
+        return "\n".join(lines)
@@ -0,0 +1,65 @@
+from lang.utils.ast_node import NodeType, walk, get_callee_name, Identity, PrintDeclaration
+from lang.passes.types import TypeInference, is_untyped
+
+# Signature letter of every type a typed print can format
+PRINT_LETTERS = {"integer": "i", "double": "d", "string": "s", "bool": "b"}
+
+class BuiltinSpecializer:
+    # Replaces calls of the `any` based prelude builtins with versions for
+    # the argument types inferred at the call: int() of a string parses it
+    # directly, int(input()) reads an integer line without building the
+    # string, int() of a number is a plain conversion, and print() with
+    # known types calls a print__<signature> function that appends every
+    # argument with strconv instead of boxing it for fmt.
+    def __init__(self, program):
+        self.program = program
+        self.inference = TypeInference(program)
+        self.functions = {declaration.name for declaration in program['body']
+                          if declaration.type in {NodeType.FUNCTION_DECLARATION, NodeType.MEMO_DECLARATION}}
+        self.prints = dict() # name -> PrintDeclaration
+        self.specialized = 0
+
+    def run(self):
+        for declaration in self.program['body']:
+            if declaration.type == NodeType.FUNCTION_DECLARATION:
+                types = self.inference.get_types(declaration)
+                for node in walk(declaration.body):
+                    if node.type == NodeType.CALL_EXPRESSION:
+                        self.specialize(node, types)
+        self.program['body'].extend(self.prints.values())
+        return self.program
+
+    def report(self):
+        return f"[SPECIALIZE] {self.specialized} builtin call(s) specialised, " \
+               f"{len(self.prints)} typed print(s)"
+
+    def specialize(self, call, types):
+        name = get_callee_name(call)
+        if name is None or name in self.functions:
+            return
+        argument_types = [self.inference.get_type(argument, types) for argument in call.arguments]
+        if name == "int" and len(argument_types) == 1:
+            argument = call.arguments[0]
+            if argument.type == NodeType.CALL_EXPRESSION and get_callee_name(argument) == "input" \
+                    and "input" not in self.functions:
+                # parses the line straight from the input buffer
+                call.callee = Identity(call.callee.line, "inputInt")
+                call.arguments = argument.arguments
+            elif argument_types[0] == "string":
+                call.callee = Identity(call.callee.line, "int__string")
+            elif argument_types[0] == "integer" or argument_types[0] == "double" and not is_untyped(argument):
+                # Go rejects converting a double constant that would truncate,
+                # even as float64(), those stay with the runtime int()
+                call.callee = Identity(call.callee.line, "int64")
+            else:
+                return
+        elif name == "print" and argument_types and all(data_type in PRINT_LETTERS
+                                                        for data_type in argument_types):
+            signature = "".join([PRINT_LETTERS[data_type] for data_type in argument_types])
+            print_name = f"print__{signature}"
+            if print_name not in self.prints:
+                self.prints[print_name] = PrintDeclaration(call.line, print_name, argument_types)
+            call.callee = Identity(call.callee.line, print_name)
+        else:
+            return
+        self.specialized += 1
@@ -0,0 +1,175 @@
+from copy import deepcopy
+from functools import reduce
+
+from lang.utils.ast_node import NodeType, walk, BinaryExpression, CallExpression, Identity, \
+    IntegerLiteral, IfStatement, BlockStatement, ReturnDeclaration, SwitchStatement, SwitchCase, \
+    IndexExpression, TableDeclaration, get_local_types
+
+MIN_CASES = 3 # shorter chains are as quick as a switch
+MAX_KEY_BITS = 8 # largest packed key, tables hold 1 << MAX_KEY_BITS values
+MAX_DEFAULT_SIZE = 16 # nodes of an else branch that may be emitted twice
+
+def get_body(statement):
+    if statement.type == NodeType.BLOCK_STATEMENT:
+        return statement.body
+    return [statement]
+
+def get_return_literal(statement):
+    body = get_body(statement)
+    if len(body) == 1 and body[0].type == NodeType.RETURN_DECLARATION and body[0].expression.type in {
+            NodeType.INTEGER_LITERAL, NodeType.DOUBLE_LITERAL, NodeType.STRING_LITERAL}:
+        return body[0].expression
+    return None
+
+def get_terms(test):
+    # variable -> literal of a test made of `variable == literal` joined by &&
+    if test.type != NodeType.BINARY_EXPRESSION:
+        return None
+    if test.operation == "&&":
+        left, right = get_terms(test.left), get_terms(test.right)
+        if left is None or right is None or left.keys() & right.keys():
+            return None
+        return {**left, **right}
+    elif test.operation == "==":
+        variable, literal = test.left, test.right
+        if variable.type != NodeType.IDENTITY:
+            variable, literal = literal, variable
+        if variable.type == NodeType.IDENTITY and literal.type in {NodeType.INTEGER_LITERAL,
+                                                                   NodeType.STRING_LITERAL}:
+            return {variable.name: literal}
+    return None
+
+class SwitchLowering:
+    # Rewrites if/else-if chains whose tests all compare the same variables
+    # against literals. One variable becomes a Go switch, several 0/1
+    # integers are packed into a key (a<<2 | b<<1 | c) that indexes a table
+    # when every branch returns a literal, or that a switch dispatches on.
+    def __init__(self, program):
+        self.program = program
+        self.switches = 0
+        self.tables = 0
+        self.function = None
+        self.types = dict()
+        self.new_tables = list()
+
+    def run(self):
+        body = list()
+        for declaration in self.program['body']:
+            if declaration.type == NodeType.FUNCTION_DECLARATION:
+                self.function = declaration
+                self.types = get_local_types(declaration)
+                self.new_tables = list()
+                declaration.body = self.lower_statements(declaration.body)
+                body.extend(self.new_tables)
+            body.append(declaration)
+        self.program['body'] = body
+        return self.program
+
+    def report(self):
+        return f"[SWITCHES] lowered {self.switches} if chain(s), {self.tables} into lookup tables"
+
+    def lower_statements(self, statements):
+        lowered = list()
+        for index, statement in enumerate(statements):
+            following = statements[index + 1] if index + 1 < len(statements) else None
+            lowered.extend(self.lower_statement(statement, following))
+        return lowered
+
+    def lower_nested(self, statement):
+        lowered = self.lower_statements([statement])
+        if len(lowered) == 1:
+            return lowered[0]
+        return BlockStatement(statement.line, lowered)
+
+    def lower_statement(self, statement, following):
+        _type = statement.type
+        if _type == NodeType.IF_STATEMENT:
+            chain = self.lower_chain(statement, following)
+            if chain is not None:
+                return chain
+            statement.consequent = self.lower_nested(statement.consequent)
+            if statement.alternate is not None:
+                statement.alternate = self.lower_nested(statement.alternate)
+        elif _type == NodeType.WHILE_STATEMENT:
+            statement.body = self.lower_nested(statement.body)
+        elif _type == NodeType.BLOCK_STATEMENT:
+            statement.body = self.lower_statements(statement.body)
+        return [statement]
+
+    def lower_chain(self, statement, following):
+        branches = list() # (terms, consequent), later duplicates are unreachable
+        keys = list()
+        node = statement
+        while node is not None and node.type == NodeType.IF_STATEMENT:
+            terms = get_terms(node.test)
+            if terms is None:
+                return None
+            key = tuple(sorted((name, literal.value) for name, literal in terms.items()))
+            if key not in keys:
+                keys.append(key)
+                branches.append((terms, node.consequent))
+            node = node.alternate
+        default = node
+        variables = list(branches[0][0])
+        if len(branches) < MIN_CASES or any(terms.keys() != set(variables) for terms, _ in branches):
+            return None
+
+        if len(variables) == 1:
+            lowered = self.lower_single(statement.line, variables[0], branches, default)
+        else:
+            lowered = self.lower_packed(statement.line, variables, branches, default, following)
+        if lowered is not None:
+            self.switches += 1
+        return lowered
+
+    def lower_single(self, line, variable, branches, default):
+        data_type = self.types.get(variable)
+        literal_type = NodeType.INTEGER_LITERAL if data_type == "integer" else NodeType.STRING_LITERAL
+        if data_type not in {"integer", "string"} or any(
+                terms[variable].type != literal_type for terms, _ in branches):
+            return None
+        cases = [SwitchCase(consequent.line, [terms[variable]], self.lower_statements(get_body(consequent)))
+                 for terms, consequent in branches]
+        default_body = None if default is None else self.lower_statements(get_body(default))
+        return [SwitchStatement(line, Identity(line, variable), cases, default_body)]
+
+    def lower_packed(self, line, variables, branches, default, following):
+        if len(variables) > MAX_KEY_BITS or any(self.types.get(variable) != "integer" for variable in variables):
+            return None
+        if any(terms[variable].type != NodeType.INTEGER_LITERAL or terms[variable].value not in {0, 1}
+               for terms, _ in branches for variable in variables):
+            return None
+
+        # only 0/1 values get a key, anything else falls through to the default
+        guard = BinaryExpression(line, CallExpression(line, Identity(line, "uint64"), [reduce(
+            lambda left, right: BinaryExpression(line, left, "|", right),
+            [Identity(line, variable) for variable in variables])]), "<=", IntegerLiteral(line, 1))
+        shifts = [Identity(line, variable) if bit == 0 else
+                  BinaryExpression(line, Identity(line, variable), "<<", IntegerLiteral(line, bit))
+                  for bit, variable in reversed(list(enumerate(reversed(variables))))]
+        key = reduce(lambda left, right: BinaryExpression(line, left, "|", right), shifts)
+        packed = [(sum(terms[variable].value << bit for bit, variable in enumerate(reversed(variables))),
+                   consequent) for terms, consequent in branches]
+
+        fallback = following if default is None else default
+        fallback = None if fallback is None else get_return_literal(fallback)
+        if (self.function.return_type in {"integer", "double", "string"} and fallback is not None
+                and all(get_return_literal(consequent) is not None for _, consequent in packed)):
+            values = [fallback] * (1 << len(variables))
+            for index, consequent in packed:
+                values[index] = get_return_literal(consequent)
+            name = f"{self.function.name}__table{len(self.new_tables) + 1}"
+            self.new_tables.append(TableDeclaration(line, name, self.function.return_type, deepcopy(values)))
+            self.tables += 1
+            lookup = ReturnDeclaration(line, IndexExpression(line, Identity(line, name), key))
+            alternate = None if default is None else BlockStatement(line, [ReturnDeclaration(line, fallback)])
+            return [IfStatement(line, guard, BlockStatement(line, [lookup]), alternate)]
+
+        default_body = None if default is None else self.lower_statements(get_body(default))
+        if default_body is not None and sum(1 for _ in walk(default_body)) > MAX_DEFAULT_SIZE:
+            return None
+        cases = [SwitchCase(consequent.line, [IntegerLiteral(line, index)],
+                            self.lower_statements(get_body(consequent))) for index, consequent in packed]
+        switch = SwitchStatement(line, key, cases, default_body)
+        alternate = None if default_body is None else BlockStatement(line, deepcopy(default_body))
+        return [IfStatement(line, guard, BlockStatement(line, [switch]), alternate)]
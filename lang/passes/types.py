@@ -0,0 +1,108 @@
+from lang.utils.ast_node import NodeType, walk, get_callee_name, get_local_types, get_element_type, \
+    get_channel_type
+
+# Types the inference knows, bool is the type of comparisons
+KNOWN_TYPES = {"integer", "double", "string", "bool"}
+
+# Result types of the prelude builtins and the Go conversions the passes emit
+BUILTIN_TYPES = {
+    "input": "string",
+    "inputInt": "integer",
+    "int": "integer",
+    "int__string": "integer",
+    "int64": "integer",
+    "len": "integer",
+    "float64": "double"
+}
+
+COMPARISONS = {"==", "!=", "<", ">", "<=", ">=", "&&", "||"}
+
+# Nodes of the expressions Go evaluates as untyped constants
+UNTYPED = {
+    NodeType.INTEGER_LITERAL,
+    NodeType.DOUBLE_LITERAL,
+    NodeType.STRING_LITERAL,
+    NodeType.BINARY_EXPRESSION,
+    NodeType.UNARY_EXPRESSION
+}
+
+def get_known_type(data_type):
+    # data_type when it is a known type or a list or channel of one, None otherwise
+    if data_type is None:
+        return None
+    if data_type in KNOWN_TYPES or get_known_type(get_element_type(data_type)) is not None \
+            or get_known_type(get_channel_type(data_type)) is not None:
+        return data_type
+    return None
+
+def is_untyped(expression):
+    # literal only expressions are untyped Go constants
+    return all(node.type in UNTYPED for node in walk(expression))
+
+class TypeInference:
+    # Beezus type of expressions from the declared types of functions,
+    # parameters and locals, None wherever it is not known
+    def __init__(self, program):
+        self.results = dict() # function -> result type
+        self.tables = dict()
+        for declaration in program['body']:
+            if declaration.type in {NodeType.FUNCTION_DECLARATION, NodeType.MEMO_DECLARATION}:
+                self.results[declaration.name] = declaration.return_type
+            elif declaration.type == NodeType.TABLE_DECLARATION:
+                self.tables[declaration.name] = declaration.data_type
+
+    def get_types(self, function):
+        # locals declared without a type (var x = e) take the type of e
+        types = get_local_types(function)
+        for node in walk(function.body):
+            if node.type == NodeType.VARIABLE_DECLARATION and node.data_type == "" \
+                    and types.get(node.variable) == "" and node.expression is not None:
+                types[node.variable] = self.get_type(node.expression, types)
+        return types
+
+    def get_type(self, expression, types):
+        _type = expression.type
+        if _type == NodeType.INTEGER_LITERAL:
+            return "integer"
+        elif _type == NodeType.DOUBLE_LITERAL:
+            return "double"
+        elif _type == NodeType.STRING_LITERAL:
+            return "string"
+        elif _type == NodeType.IDENTITY:
+            return get_known_type(types.get(expression.name))
+        elif _type == NodeType.UNARY_EXPRESSION:
+            if expression.operation == "!":
+                return "bool"
+            return self.get_type(expression.right, types)
+        elif _type == NodeType.BINARY_EXPRESSION:
+            if expression.operation in COMPARISONS:
+                return "bool"
+            left = self.get_type(expression.left, types)
+            right = self.get_type(expression.right, types)
+            if left is None or right is None or left == right:
+                return left if left == right else None
+            # an untyped constant takes the type of the other operand
+            left_untyped, right_untyped = is_untyped(expression.left), is_untyped(expression.right)
+            if left_untyped and right_untyped:
+                return "double" if "double" in {left, right} else None
+            elif left_untyped:
+                return right
+            elif right_untyped:
+                return left
+            return None
+        elif _type == NodeType.CALL_EXPRESSION:
+            name = get_callee_name(expression)
+            if name == "receive" and name not in self.results and len(expression.arguments) == 1:
+                return get_channel_type(self.get_type(expression.arguments[0], types))
+            if name in self.results:
+                data_type = self.results[name]
+            else:
+                data_type = BUILTIN_TYPES.get(name)
+            return get_known_type(data_type)
+        elif _type in {NodeType.LIST_LITERAL, NodeType.MAKE_EXPRESSION}:
+            return get_known_type(expression.data_type)
+        elif _type == NodeType.INDEX_EXPRESSION:
+            if expression.target.type == NodeType.IDENTITY and expression.target.name in self.tables:
+                return self.tables[expression.target.name]
+            return get_element_type(self.get_type(expression.target, types))
+        return None
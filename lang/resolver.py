@@ -0,0 +1,96 @@
+import os
+import json
+import time
+
+# A directory changed this close to its listing may have changed again
+# within the same mtime tick, it is listed again next time
+RACY_WINDOW = 2 * 10 ** 9
+
+def get_library_paths(lib_paths=()):
+    # the --lib-path directories, then the BEEZUS_PATH ones
+    environment_paths = [path for path in os.environ.get("BEEZUS_PATH", "").split(os.pathsep) if path]
+    return [os.path.abspath(path) for path in list(lib_paths) + environment_paths]
+
+def get_search_paths(beezus_home, program_home, lib_paths=()):
+    # where imports are looked for, in order: next to the program, the
+    # library paths and the bundled libs
+    return [program_home] + get_library_paths(lib_paths) + [os.path.join(beezus_home, "libs")]
+
+class ModuleIndex:
+    # The module files of every directory an import was looked up in, so a
+    # candidate is a set lookup instead of a stat. Persisted at index_path
+    # with the mtime of every directory: adding, removing or renaming a
+    # module changes it and the directory is listed again. A process checks
+    # each directory once, refresh() checks them all again.
+    def __init__(self, index_path=None):
+        self.index_path = index_path
+        self.directories = dict() # directory -> (mtime, listed at, module file names)
+        self.checked = set()
+        self.changed = False
+        if index_path is not None:
+            self.load()
+
+    def exists(self, path):
+        directory, name = os.path.split(path)
+        return name in self.get_listing(directory)
+
+    def get_listing(self, directory):
+        entry = self.directories.get(directory)
+        if directory in self.checked:
+            return entry[2]
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            mtime = None
+        if entry is None or entry[0] != mtime or (mtime is not None and entry[1] - mtime < RACY_WINDOW):
+            names = set()
+            if mtime is not None:
+                try:
+                    names = {name for name in os.listdir(directory) if name.endswith(".bz")}
+                except OSError:
+                    pass
+            entry = (mtime, time.time_ns(), names)
+            self.directories[directory] = entry
+            self.changed = True
+        self.checked.add(directory)
+        return entry[2]
+
+    def refresh(self):
+        self.checked = set()
+
+    def load(self):
+        try:
+            with open(self.index_path) as index_file:
+                directories = json.load(index_file)
+            self.directories = {directory: (mtime, listed, set(names))
+                                for directory, (mtime, listed, names) in directories.items()}
+        except (OSError, ValueError, TypeError):
+            self.directories = dict()
+
+    def save(self):
+        if self.index_path is None or not self.changed:
+            return
+        directories = {directory: [mtime, listed, sorted(names)]
+                       for directory, (mtime, listed, names) in self.directories.items() if mtime is not None}
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        temp_path = self.index_path + f".{os.getpid()}"
+        with open(temp_path, 'w') as index_file:
+            json.dump(directories, index_file, sort_keys=True)
+        os.replace(temp_path, self.index_path)
+        self.changed = False
+
+class ModuleResolver:
+    # Maps an import (a module path like example/cow) to the first search
+    # path that has it
+    def __init__(self, search_paths, index=None):
+        self.search_paths = [os.path.abspath(path) for path in search_paths]
+        self.index = ModuleIndex() if index is None else index
+
+    def get_candidates(self, import_module):
+        return [os.path.join(path, import_module + ".bz") for path in self.search_paths]
+
+    def resolve(self, import_module):
+        for candidate in self.get_candidates(import_module):
+            if self.index.exists(candidate):
+                return candidate
+        return None
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from lang.utils.ast_node import NodeType, walk
+
+try:
+    import resource
+except ImportError: # Windows, the CPU time of children is left out there
+    resource = None
+
+NODE_NAMES = {value: name for name, value in vars(NodeType).items() if name.isupper()}
+
+def get_cpu_time():
+    # CPU time of this process and of the children it waited for, go build
+    # and the module parsing workers run in those
+    cpu = time.process_time()
+    if resource is not None:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu += children.ru_utime + children.ru_stime
+    return cpu
+
+class Stats:
+    # Wall and CPU time of the phases of one compile and of every imported
+    # module, what went in and came out of it and, with memory, the peak of
+    # the Python allocations (tracemalloc slows the compile down, timings
+    # taken with it are inflated). report() prints a table and writes the
+    # same figures as JSON to json_path.
+    def __init__(self, memory=False, table=True, json_path=None):
+        self.memory = memory
+        self.table = table
+        self.json_path = json_path
+        self.reset()
+
+    def reset(self, file_path=None):
+        self.file_path = file_path
+        self.phases = dict() # name -> [wall, cpu, calls]
+        self.modules = dict() # path -> (source, wall, cpu, tokens)
+        self.counters = dict()
+        self.program = None # the tree handed to the code generation, its nodes are counted by report()
+        self.started = None
+        self.total = None
+        self.peak = None
+
+    def start(self, file_path):
+        self.reset(file_path)
+        if self.memory:
+            tracemalloc.start()
+        self.started = (time.perf_counter(), get_cpu_time())
+
+    def finish(self):
+        wall, cpu = self.started
+        self.total = (time.perf_counter() - wall, get_cpu_time() - cpu)
+        if self.memory and tracemalloc.is_tracing():
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name):
+        # phases entered more than once (the tree shaker) add up
+        wall, cpu = time.perf_counter(), get_cpu_time()
+        try:
+            yield
+        finally:
+            entry = self.phases.setdefault(name, [0.0, 0.0, 0])
+            entry[0] += time.perf_counter() - wall
+            entry[1] += get_cpu_time() - cpu
+            entry[2] += 1
+
+    def add_module(self, path, source, wall, cpu, tokens=None):
+        # source is "parsed" or "cached", a cached module has no tokens
+        self.modules[path] = (source, wall, cpu, tokens)
+        if tokens is not None:
+            self.count("tokens", tokens)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def get_nodes(self):
+        nodes = dict()
+        if self.program is not None:
+            for node in walk(self.program['body']):
+                name = NODE_NAMES[node.type]
+                nodes[name] = nodes.get(name, 0) + 1
+        return dict(sorted(nodes.items()))
+
+    def to_json(self):
+        return {
+            "program": self.file_path,
+            "wall": self.total[0] if self.total is not None else None,
+            "cpu": self.total[1] if self.total is not None else None,
+            "phases": [{"name": name, "wall": wall, "cpu": cpu, "calls": calls}
+                       for name, (wall, cpu, calls) in self.phases.items()],
+            "modules": [{"path": path, "source": source, "wall": wall, "cpu": cpu, "tokens": tokens}
+                        for path, (source, wall, cpu, tokens) in self.modules.items()],
+            "counters": dict(self.counters),
+            "nodes": self.get_nodes(),
+            "peak_memory": self.peak
+        }
+
+    def get_table(self):
+        report = self.to_json()
+        lines = [f"[TIMINGS] {self.file_path}"]
+        rows = [(phase["name"], phase["wall"], phase["cpu"]) for phase in report["phases"]]
+        if self.total is not None:
+            rows.append(("total", report["wall"], report["cpu"]))
+        width = max([len("phase")] + [len(name) for name, _, _ in rows])
+        lines.append(f"  {'phase'.ljust(width)}  {'wall ms':>9}  {'cpu ms':>9}")
+        for name, wall, cpu in rows:
+            lines.append(f"  {name.ljust(width)}  {wall * 1000:9.1f}  {cpu * 1000:9.1f}")
+        if report["modules"]:
+            paths = [os.path.relpath(module["path"]) for module in report["modules"]]
+            width = max([len("module")] + [len(path) for path in paths])
+            lines.append(f"  {'module'.ljust(width)}  {'source':<6}  {'wall ms':>9}  {'cpu ms':>9}  {'tokens':>7}")
+            for path, module in zip(paths, report["modules"]):
+                tokens = "" if module["tokens"] is None else module["tokens"]
+                lines.append(f"  {path.ljust(width)}  {module['source']:<6}  {module['wall'] * 1000:9.1f}  "
+                             f"{module['cpu'] * 1000:9.1f}  {tokens:>7}")
+        counters = list(report["counters"].items())
+        if report["peak_memory"] is not None:
+            counters.append(("peak memory KiB", report["peak_memory"] // 1024))
+        for title, rows in (("counter", counters), ("node", list(report["nodes"].items()))):
+            if rows:
+                width = max([len(title)] + [len(name) for name, _ in rows])
+                lines.append(f"  {title.ljust(width)}  {'count':>9}")
+                for name, value in rows:
+                    lines.append(f"  {name.ljust(width)}  {value:>9}")
+        return "\n".join(lines)
+
+    def report(self):
+        if self.table:
+            print(self.get_table())
+        if self.json_path == "-":
+            print(json.dumps(self.to_json()))
+        elif self.json_path is not None:
+            with open(self.json_path, "w") as json_file:
+                json.dump(self.to_json(), json_file, indent=2)
+                json_file.write("\n")
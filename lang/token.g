@@ -3,6 +3,6 @@
 | (?P<FLOAT>\d+\.\d+)                                     # float numbers
 | (?P<INTEGER>\d+)                                        # integer numbers
 | (?P<STRING>"(?:\\.|[^"\\])*")                           # double-quoted strings with escape support
-| (?P<OPERATOR>\+=|-=|\*=|/=|%=|==|<=|>=|!=|&&|\|\||=|\+|\-|\*|\/|%|<|>|\(|\)|\{|\}|;|,)  # operators and punctuation
+| (?P<OPERATOR>\+=|-=|\*=|/=|%=|==|<=|>=|!=|&&|\|\||=|\+|\-|\*|\/|%|<|>|\(|\)|\{|\}|\[|\]|;|,)  # operators and punctuation
 | (?P<DOT_OPERATOR>\.)                                    # dot operator (for object properties/methods)
 | (?P<NEWLINE>\n)                                         # new line
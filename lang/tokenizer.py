@@ -17,6 +17,8 @@ class TokenType:
     KW_IF = 10
     KW_ELSE = 11
     KW_WHILE = 12
+    KW_SPAWN = 13
+    KW_WAIT = 14
 
     SEMICOLON = 100
     OPEN_PARAM = 101
@@ -41,6 +43,8 @@ class TokenType:
     MINUS_EQUAL = 120
     OR = 121
     AND = 122
+    OPEN_BRACKET = 123
+    CLOSE_BRACKET = 124
 
     GHOST_NAME = 200
 
@@ -51,11 +55,21 @@ class TokenType:
         return None
 
 class Token:
-    def __init__(self, raw, type, line): 
-        self.raw = raw
+    __slots__ = ("source", "type", "start", "end", "line")
+
+    def __init__(self, source, type, start, end, line):
+        self.source = source
         self.type = type
+        self.start = start
+        self.end = end
         self.line = line
 
+    @property
+    def raw(self):
+        # text is sliced out of the source buffer only when it is asked for
+        raw = self.source[self.start:self.end]
+        return raw if isinstance(raw, str) else raw.decode()
+
     def expect(self, *type):
         if not self.match(*type):
             expected = ', '.join([TokenType.to_string(t) for t in type])
@@ -65,87 +79,113 @@ class Token:
     def match(self, *type): 
         return self.type in type
 
+KEYWORDS = {
+    "return": TokenType.KW_RETURN,
+    "var": TokenType.KW_VAR,
+    "const": TokenType.KW_CONST,
+    "package": TokenType.KW_PACKAGE,
+    "import": TokenType.KW_IMPORT,
+    "pass": TokenType.KW_PASS,
+    "if": TokenType.KW_IF,
+    "else": TokenType.KW_ELSE,
+    "while": TokenType.KW_WHILE,
+    "spawn": TokenType.KW_SPAWN,
+    "wait": TokenType.KW_WAIT,
+    "main__": TokenType.GHOST_NAME
+}
+
+SYMBOLS = {
+    '(': TokenType.OPEN_PARAM,
+    ')': TokenType.CLOSE_PARAM,
+    '{': TokenType.OPEN_BRACE,
+    '}': TokenType.CLOSE_BRACE,
+    '[': TokenType.OPEN_BRACKET,
+    ']': TokenType.CLOSE_BRACKET,
+    ';': TokenType.SEMICOLON,
+    '=': TokenType.EQUAL,
+    ',': TokenType.COMMA,
+    '==': TokenType.EQUAL_EQUAL,
+    '!=': TokenType.BANG_EQUAL,
+    '>': TokenType.GREATER,
+    '<': TokenType.LESSER,
+    '>=': TokenType.GREATER_EQUAL,
+    '<=': TokenType.LESSER_EQUAL,
+    '!': TokenType.NOT,
+    '+': TokenType.PLUS,
+    '+=': TokenType.PLUS_EQUAL,
+    '-': TokenType.MINUS,
+    '-=': TokenType.MINUS_EQUAL,
+    '*': TokenType.STAR,
+    '/': TokenType.SLASH,
+    '||': TokenType.OR,
+    '&&': TokenType.AND
+}
+
+# Token types of the grammar groups that map one to one on a token type
+GROUP_TYPES = {
+    "INTEGER": TokenType.INTEGER,
+    "FLOAT": TokenType.DOUBLE,
+    "STRING": TokenType.STRING,
+    "DOT_OPERATOR": TokenType.DOT
+}
+
+# Same tables keyed by bytes for sources read through mmap
+BYTE_KEYWORDS = {keyword.encode(): token_type for keyword, token_type in KEYWORDS.items()}
+BYTE_SYMBOLS = {symbol.encode(): token_type for symbol, token_type in SYMBOLS.items()}
+
+_compiled_grammars = dict()
+
+def compile_grammar(grammar):
+    compiled_grammar = _compiled_grammars.get(grammar)
+    if compiled_grammar is None:
+        compiled_grammar = re.compile(grammar, re.VERBOSE)
+        _compiled_grammars[grammar] = compiled_grammar
+    return compiled_grammar
+
 class Tokenizer:
     def __init__(self, grammar):
         self.grammar = grammar
+        self.compiled_grammar = compile_grammar(grammar)
         self.line = 1
 
     def reset(self):
         self.line = 1
 
     def tokenize(self, program):
-        tokens = list()
-        compiled_grammar = re.compile(self.grammar, re.VERBOSE)
-        for item in compiled_grammar.finditer(program):
-            token_type, raw_token = self.__get_token_type(item.groupdict())
-            if token_type is None: continue
-            tokens.append(
-                Token(raw_token, token_type, self.line)
-            )
-            if token_type == TokenType.STRING: self.line += raw_token.count('\n')
-        return tokens
-            
-    def __get_token_type(self, token):
-        if token['IDENTIFIER'] is not None:
-            token_type = self.__is_keyword(token['IDENTIFIER'])
-            return TokenType.ID if token_type is None else token_type, token['IDENTIFIER']
-        elif token['INTEGER'] is not None:
-            return TokenType.INTEGER, token['INTEGER']
-        elif token['FLOAT'] is not None:
-            return TokenType.DOUBLE, token['FLOAT']
-        elif token['STRING'] is not None:
-            return TokenType.STRING, token['STRING']
-        elif token['OPERATOR'] is not None:
-            symbol_type = self.__get_symbol(token['OPERATOR'])
-            if symbol_type is None: raise TokenError(f"Invalid Token '{token['OPERATOR']}'", self.line)
-            return symbol_type, token['OPERATOR']
-        elif token['DOT_OPERATOR'] is not None:
-            return TokenType.DOT, token['DOT_OPERATOR']
-        elif token['NEWLINE'] is not None:
-            self.line += 1
-            return None, None
-        elif token['COMMENT'] is not None:
-            return None, None
+        return list(self.scan(program, self.line))
+
+    def stream(self, source, line=1):
+        # Lazily tokenizes a str or bytes-like (mmap) source, does not touch
+        # the tokenizer state so several streams can be suspended at once
+        return self.scan(source, line)
+
+    def scan(self, source, line):
+        if isinstance(source, str):
+            compiled_grammar = self.compiled_grammar
+            keywords, symbols, newline = KEYWORDS, SYMBOLS, '\n'
         else:
-            raise TokenError("Reached Unreachable code @Tokenizer -> get_token_type", self.line)
-        
-    def __is_keyword(self, identifier):
-        return {
-            "return": TokenType.KW_RETURN,
-            "var": TokenType.KW_VAR,
-            "const": TokenType.KW_CONST,
-            "package": TokenType.KW_PACKAGE, 
-            "import": TokenType.KW_IMPORT,
-            "pass": TokenType.KW_PASS,
-            "if": TokenType.KW_IF,
-            "else": TokenType.KW_ELSE,
-            "while": TokenType.KW_WHILE,
-            "main__": TokenType.GHOST_NAME
-        }.get(identifier)
-    
-    def __get_symbol(self, symbol):
-        return {
-            '(': TokenType.OPEN_PARAM,
-            ')': TokenType.CLOSE_PARAM,
-            '{': TokenType.OPEN_BRACE,
-            '}': TokenType.CLOSE_BRACE,
-            ';': TokenType.SEMICOLON,
-            '=': TokenType.EQUAL,
-            ',': TokenType.COMMA,
-            '==': TokenType.EQUAL_EQUAL,
-            '!=': TokenType.BANG_EQUAL,
-            '>': TokenType.GREATER,
-            '<': TokenType.LESSER,
-            '>=': TokenType.GREATER_EQUAL,
-            '<=': TokenType.LESSER_EQUAL,
-            '!': TokenType.NOT,
-            '+': TokenType.PLUS,
-            '+=': TokenType.PLUS_EQUAL,
-            '-': TokenType.MINUS,
-            '-=': TokenType.MINUS_EQUAL,
-            '*': TokenType.STAR,
-            '/': TokenType.SLASH,
-            '||': TokenType.OR,
-            '&&': TokenType.AND
-        }.get(symbol)
-        
+            compiled_grammar = compile_grammar(self.grammar.encode())
+            keywords, symbols, newline = BYTE_KEYWORDS, BYTE_SYMBOLS, b'\n'
+        group_types = GROUP_TYPES
+        identifier_type = TokenType.ID
+        for item in compiled_grammar.finditer(source):
+            group = item.lastgroup
+            # fast path, identifiers and operators make up most of any program
+            if group == "IDENTIFIER":
+                start, end = item.span()
+                yield Token(source, keywords.get(source[start:end], identifier_type), start, end, line)
+            elif group == "OPERATOR":
+                start, end = item.span()
+                symbol_type = symbols.get(source[start:end])
+                if symbol_type is None:
+                    raise TokenError(f"Invalid Token '{Token(source, None, start, end, line).raw}'", line)
+                yield Token(source, symbol_type, start, end, line)
+            elif group == "NEWLINE":
+                line += 1
+            elif group != "COMMENT":
+                token_type = group_types.get(group)
+                if token_type is None:
+                    raise TokenError("Reached Unreachable code @Tokenizer -> scan", line)
+                start, end = item.span()
+                yield Token(source, token_type, start, end, line)
+                if token_type == TokenType.STRING: line += source[start:end].count(newline)
@@ -1,10 +1,11 @@
+from sys import intern
+
 class NodeType:
     RETURN_DECLARATION = 0
     VARIABLE_DECLARATION = 1
     CONSTANTS_DECLARATION = 2
     FUNCTION_DECLARATION = 3
     CALL_EXPRESSION = 4
-    EXPRESSION = 5
     BINARY_EXPRESSION = 6
     UNARY_EXPRESSION = 7
     INTEGER_LITERAL = 8
@@ -16,6 +17,358 @@ class NodeType:
     BLOCK_STATEMENT = 14
     ASSIGNMENT_EXPRESSION = 15
     WHILE_STATEMENT = 16
+    IMPORT_DECLARATION = 17
+    SWITCH_STATEMENT = 18
+    SWITCH_CASE = 19
+    INDEX_EXPRESSION = 20
+    TABLE_DECLARATION = 21
+    SELECTOR_EXPRESSION = 22
+    MEMO_DECLARATION = 23
+    PRINT_DECLARATION = 24
+    LIST_LITERAL = 25
+    MAKE_EXPRESSION = 26
+    SPAWN_STATEMENT = 27
+    WAIT_STATEMENT = 28
+
+class Node:
+    # Every node keeps its fields in __slots__, `fields` lists them in
+    # constructor order (after line) so passes can walk any node generically
+    __slots__ = ("line",)
+    type = None
+    fields = ()
+
+    def __reduce__(self):
+        return (self.__class__, (self.line,) + tuple(getattr(self, field) for field in self.fields))
+
+class Expression(Node):
+    __slots__ = ()
+
+class ImportDeclaration(Node):
+    __slots__ = fields = ("module",)
+    type = NodeType.IMPORT_DECLARATION
+
+    def __init__(self, line, module):
+        self.line = line
+        self.module = module
+
+class FunctionDeclaration(Node):
+    __slots__ = fields = ("name", "return_type", "params", "body")
+    type = NodeType.FUNCTION_DECLARATION
+
+    def __init__(self, line, name, return_type, params, body):
+        self.line = line
+        self.name = intern(name)
+        self.return_type = intern(return_type)
+        self.params = [(intern(p_name), intern(p_type)) for p_name, p_type in params]
+        self.body = body
+
+class ReturnDeclaration(Node):
+    __slots__ = fields = ("expression",)
+    type = NodeType.RETURN_DECLARATION
+
+    def __init__(self, line, expression):
+        self.line = line
+        self.expression = expression
+
+class VariableDeclaration(Node):
+    __slots__ = fields = ("data_type", "variable", "expression")
+    type = NodeType.VARIABLE_DECLARATION
+
+    def __init__(self, line, data_type, variable, expression):
+        self.line = line
+        self.data_type = intern(data_type)
+        self.variable = intern(variable)
+        self.expression = expression
+
+class ConstantsDeclaration(VariableDeclaration):
+    __slots__ = ()
+    type = NodeType.CONSTANTS_DECLARATION
+
+class IfStatement(Node):
+    __slots__ = fields = ("test", "consequent", "alternate")
+    type = NodeType.IF_STATEMENT
+
+    def __init__(self, line, test, consequent, alternate):
+        self.line = line
+        self.test = test
+        self.consequent = consequent
+        self.alternate = alternate
+
+class WhileStatement(Node):
+    __slots__ = fields = ("test", "body")
+    type = NodeType.WHILE_STATEMENT
+
+    def __init__(self, line, test, body):
+        self.line = line
+        self.test = test
+        self.body = body
+
+class BlockStatement(Node):
+    __slots__ = fields = ("body",)
+    type = NodeType.BLOCK_STATEMENT
+
+    def __init__(self, line, body):
+        self.line = line
+        self.body = body
+
+class SwitchStatement(Node):
+    # default is a list of statements or None when there is no default case
+    __slots__ = fields = ("test", "cases", "default")
+    type = NodeType.SWITCH_STATEMENT
+
+    def __init__(self, line, test, cases, default):
+        self.line = line
+        self.test = test
+        self.cases = cases
+        self.default = default
+
+class SpawnStatement(Node):
+    # runs call in a goroutine, wait joins every spawned call
+    __slots__ = fields = ("call",)
+    type = NodeType.SPAWN_STATEMENT
+
+    def __init__(self, line, call):
+        self.line = line
+        self.call = call
+
+class WaitStatement(Node):
+    __slots__ = fields = ()
+    type = NodeType.WAIT_STATEMENT
+
+    def __init__(self, line):
+        self.line = line
+
+class SwitchCase(Node):
+    __slots__ = fields = ("values", "body")
+    type = NodeType.SWITCH_CASE
+
+    def __init__(self, line, values, body):
+        self.line = line
+        self.values = values
+        self.body = body
+
+class TableDeclaration(Node):
+    # package level lookup table, values are literals
+    __slots__ = fields = ("name", "data_type", "values")
+    type = NodeType.TABLE_DECLARATION
+
+    def __init__(self, line, name, data_type, values):
+        self.line = line
+        self.name = intern(name)
+        self.data_type = intern(data_type)
+        self.values = values
+
+class MemoDeclaration(Node):
+    # cache in front of the function `name`, whose body was renamed to
+    # name__impl. size is the number of slots, 0 for an unbounded map
+    __slots__ = fields = ("name", "return_type", "params", "size")
+    type = NodeType.MEMO_DECLARATION
+
+    def __init__(self, line, name, return_type, params, size):
+        self.line = line
+        self.name = intern(name)
+        self.return_type = intern(return_type)
+        self.params = params
+        self.size = size
+
+class PrintDeclaration(Node):
+    # print specialised for arguments of the given Beezus types
+    __slots__ = fields = ("name", "types")
+    type = NodeType.PRINT_DECLARATION
+
+    def __init__(self, line, name, types):
+        self.line = line
+        self.name = intern(name)
+        self.types = types
+
+class AssignmentExpression(Expression):
+    __slots__ = fields = ("left", "operation", "right")
+    type = NodeType.ASSIGNMENT_EXPRESSION
+
+    def __init__(self, line, left, operation, right):
+        self.line = line
+        self.left = left
+        self.operation = intern(operation)
+        self.right = right
+
+class BinaryExpression(Expression):
+    __slots__ = fields = ("left", "operation", "right")
+    type = NodeType.BINARY_EXPRESSION
+
+    def __init__(self, line, left, operation, right):
+        self.line = line
+        self.left = left
+        self.operation = intern(operation)
+        self.right = right
+
+class UnaryExpression(Expression):
+    __slots__ = fields = ("operation", "right")
+    type = NodeType.UNARY_EXPRESSION
+
+    def __init__(self, line, operation, right):
+        self.line = line
+        self.operation = intern(operation)
+        self.right = right
+
+class CallExpression(Expression):
+    __slots__ = fields = ("callee", "arguments")
+    type = NodeType.CALL_EXPRESSION
+
+    def __init__(self, line, callee, arguments):
+        self.line = line
+        self.callee = callee
+        self.arguments = arguments
+
+class IndexExpression(Expression):
+    __slots__ = fields = ("target", "index")
+    type = NodeType.INDEX_EXPRESSION
+
+    def __init__(self, line, target, index):
+        self.line = line
+        self.target = target
+        self.index = index
+
+class SelectorExpression(Expression):
+    # a Go selector, target.name, for the methods of runtime types
+    __slots__ = fields = ("target", "name")
+    type = NodeType.SELECTOR_EXPRESSION
+
+    def __init__(self, line, target, name):
+        self.line = line
+        self.target = target
+        self.name = intern(name)
+
+class ListLiteral(Expression):
+    # data_type is the list<T> type the literal builds, None while unknown
+    __slots__ = fields = ("data_type", "values")
+    type = NodeType.LIST_LITERAL
+
+    def __init__(self, line, data_type, values):
+        self.line = line
+        self.data_type = data_type
+        self.values = values
+
+class MakeExpression(Expression):
+    # newList(length, capacity), a list<T> of length zero values, or
+    # newChannel(capacity), a chan<T>; length is None for a channel
+    __slots__ = fields = ("data_type", "length", "capacity")
+    type = NodeType.MAKE_EXPRESSION
+
+    def __init__(self, line, data_type, length, capacity):
+        self.line = line
+        self.data_type = data_type
+        self.length = length
+        self.capacity = capacity
+
+class IntegerLiteral(Expression):
+    __slots__ = fields = ("value",)
+    type = NodeType.INTEGER_LITERAL
+
+    def __init__(self, line, value):
+        self.line = line
+        self.value = value
+
+class StringLiteral(Expression):
+    # value is the Go literal including its quotes and escapes
+    __slots__ = fields = ("value",)
+    type = NodeType.STRING_LITERAL
+
+    def __init__(self, line, value):
+        self.line = line
+        self.value = value
+
+class DoubleLiteral(Expression):
+    __slots__ = fields = ("value",)
+    type = NodeType.DOUBLE_LITERAL
+
+    def __init__(self, line, value):
+        self.line = line
+        self.value = value
+
+class Identity(Expression):
+    __slots__ = fields = ("name",)
+    type = NodeType.IDENTITY
+
+    def __init__(self, line, name):
+        self.line = line
+        self.name = intern(name)
+
+class MembershipExpression(Expression):
+    __slots__ = fields = ("name", "property")
+    type = NodeType.MEMBERSHIP_EXPRESSION
+
+    def __init__(self, line, name, property):
+        self.line = line
+        self.name = intern(name)
+        self.property = property
+
+class LazyBody:
+    # Source text of a function body that has only been brace matched so far,
+    # from its opening to its closing brace, and the line it starts on
+    __slots__ = ("source", "line")
+
+    def __init__(self, source, line):
+        self.source = source
+        self.line = line
+
+    def __reduce__(self):
+        return (self.__class__, (self.source, self.line))
+
+def walk(node):
+    # yields node and every node below it, depth first
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
+        if not isinstance(node, Node):
+            continue
+        yield node
+        for field in reversed(node.fields):
+            stack.append(getattr(node, field))
+
+def get_membership_name(membership):
+    if membership.type == NodeType.IDENTITY:
+        return membership.name
+    elif membership.type == NodeType.MEMBERSHIP_EXPRESSION:
+        return membership.name + "_" + get_membership_name(membership.property)
+    raise Exception("Unimplemented membership expression type: " + str(membership.type))
+
+def get_assigned_name(target):
+    # the variable an assignment changes, for xs[i] = v that is xs
+    while target.type == NodeType.INDEX_EXPRESSION:
+        target = target.target
+    return get_membership_name(target)
+
+def get_type_argument(data_type, generic):
+    # T of generic<T>, None for any other type
+    prefix = generic + "<"
+    if data_type is not None and data_type.startswith(prefix) and data_type.endswith(">"):
+        return data_type[len(prefix):-1]
+    return None
+
+def get_element_type(data_type):
+    return get_type_argument(data_type, "list")
+
+def get_channel_type(data_type):
+    return get_type_argument(data_type, "chan")
+
+def get_local_types(function):
+    # parameter and local name -> declared type, None for a name that is
+    # declared with two different types somewhere in the function
+    types = dict(function.params)
+    for node in walk(function.body):
+        if node.type in {NodeType.VARIABLE_DECLARATION, NodeType.CONSTANTS_DECLARATION}:
+            data_type = types.get(node.variable, node.data_type)
+            types[node.variable] = data_type if data_type == node.data_type else None
+    return types
+
+def get_callee_name(call):
+    # the Beezus function a call targets, None for a method of a Go value
+    if call.callee.type == NodeType.SELECTOR_EXPRESSION:
+        return None
+    return get_membership_name(call.callee)
 
 def get_default_type_mapping(_type):
     default_types = {
@@ -24,4 +377,10 @@ def get_default_type_mapping(_type):
         "double": "float64",
         "void": ""
     }
-    return default_types.get(_type) if _type in default_types else _type
\ No newline at end of file
+    element_type = get_element_type(_type)
+    if element_type is not None:
+        return "[]" + get_default_type_mapping(element_type)
+    element_type = get_channel_type(_type)
+    if element_type is not None:
+        return "chan " + get_default_type_mapping(element_type)
+    return default_types.get(_type) if _type in default_types else _type
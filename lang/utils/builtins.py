@@ -0,0 +1,34 @@
+class Builtin:
+    # pure: the result only depends on the arguments and nothing else happens
+    # panics: it can stop the program for some arguments
+    __slots__ = ("name", "pure", "panics")
+
+    def __init__(self, name, pure, panics):
+        self.name = name
+        self.pure = pure
+        self.panics = panics
+
+# Functions of lang/default.go, plus the Go conversions the passes emit
+BUILTINS = {builtin.name: builtin for builtin in [
+    Builtin("print", pure=False, panics=False),
+    Builtin("input", pure=False, panics=False),
+    Builtin("inputInt", pure=False, panics=True),
+    Builtin("flush", pure=False, panics=False),
+    Builtin("len", pure=True, panics=False),
+    # may store into the backing array of its first argument
+    Builtin("append", pure=False, panics=False),
+    Builtin("send", pure=False, panics=True),
+    Builtin("receive", pure=False, panics=False),
+    Builtin("close", pure=False, panics=True),
+    Builtin("int", pure=True, panics=True),
+    Builtin("int__string", pure=True, panics=True),
+    Builtin("int64", pure=True, panics=False),
+    Builtin("uint64", pure=True, panics=False),
+    Builtin("float64", pure=True, panics=False)
+]}
+
+def get_builtin(name, functions=()):
+    # functions are the names the program declares, they shadow builtins
+    if name in functions:
+        return None
+    return BUILTINS.get(name)
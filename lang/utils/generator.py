@@ -13,4 +13,50 @@ class Generator:
         return self.peek()
     
     def has_next(self): 
-        return self.pointer < self.count
\ No newline at end of file
+        return self.pointer < self.count
+
+    def close(self):
+        pass
+
+class StreamGenerator:
+    # Pulls items lazily from an iterator into a ring buffer. The parser looks
+    # at most one item back (next(-1), peek(-1)) and two ahead (next(2)), so
+    # only a handful of items are ever alive at once.
+    def __init__(self, items, size=8):
+        self.items = iter(items)
+        self.size = size
+        self.buffer = [None] * size
+        self.count = 0 # items pulled from the stream so far
+        self.exhausted = False
+        self.pointer = 0
+
+    def fill(self, index):
+        while self.count <= index and not self.exhausted:
+            item = next(self.items, None)
+            if item is None:
+                self.exhausted = True
+                break
+            self.buffer[self.count % self.size] = item
+            self.count += 1
+        return index < self.count
+
+    def peek(self, offset=0):
+        if not self.has_next(): return None
+        index = self.pointer + offset
+        if index < 0 or index <= self.count - self.size:
+            raise IndexError(f"Stream lookbehind exceeded at item {index}")
+        if not self.fill(index):
+            raise IndexError(f"Stream exhausted at item {index}")
+        return self.buffer[index % self.size]
+
+    def next(self, offset = 1):
+        self.pointer += offset
+        return self.peek()
+
+    def has_next(self):
+        return self.pointer < self.count or self.fill(self.pointer)
+
+    def close(self):
+        # releases the source buffer held by a suspended tokenizer stream
+        if hasattr(self.items, "close"):
+            self.items.close()
@@ -0,0 +1,14 @@
+import os
+import mmap
+from contextlib import contextmanager
+
+@contextmanager
+def open_source(path):
+    # Maps a source file into memory instead of reading it into a str, tokens
+    # only keep offsets into this buffer
+    with open(path, "rb") as source_file:
+        if os.fstat(source_file.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            yield source
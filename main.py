@@ -1,38 +1,412 @@
 import os
+import re
+import sys
+import glob
+import time
+import argparse
+import subprocess
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
 
 from lang.parser import Parser
 from lang.tokenizer import Tokenizer
-from lang.compiler import Compiler
+from lang.modules import ModuleGraph
+from lang.passes.reachability import TreeShaker
+from lang.passes.inliner import Inliner
+from lang.passes.switches import SwitchLowering
+from lang.passes.builders import StringBuilders
+from lang.passes.licm import LoopInvariants
+from lang.passes.memoize import Memoizer
+from lang.passes.specialize import BuiltinSpecializer
+from lang.passes.optimizer import Optimizer, DEFAULT_LEVEL, TRANSFORMS, get_transforms, \
+    get_params, PARAMS
+from lang.compiler import Compiler, DEFAULT_PATH
 from lang.expections import LoomSyntaxError
+from lang.utils.source import open_source
+from lang.utils.ast_node import NodeType
+from lang.cache import BuildCache, SharedModuleCache, get_cache_home, compiler_fingerprint, compiler_version
+from lang.stats import Stats
+from lang.resolver import ModuleIndex, ModuleResolver, get_search_paths, get_library_paths
 
-def main(file_path):
-    beezus_home = os.path.dirname(os.path.abspath(__file__))
-    program_home = os.path.dirname(get_program_home(file_path))
-    with open(file_path) as program_file:
-        raw_program = program_file.read()
+BEEZUS_HOME = os.path.dirname(os.path.abspath(__file__))
+GRAMMAR_PATH = os.path.join(BEEZUS_HOME, "lang", "token.g")
 
-    with open("lang/token.g") as grammar_file:
-        token_grammar = grammar_file.read()
+# Module index next to the build cache, see ModuleIndex
+INDEX_NAME = "module_index.json"
 
-    tokenizer = Tokenizer(token_grammar)
-    parser = Parser(tokenizer, beezus_home, program_home, raw_program, set())
-    tree = parser.parse()
-    if tree is None:
-        raise LoomSyntaxError("Incomplete program file")
+# Seconds between two looks at the files of a watched program
+WATCH_INTERVAL = 0.2
 
-    # import json
-    # tree['import'] = list(tree['import'])
-    # print(json.dumps(tree, indent=2))
+# go.mod of a batch's Go module, the prelude needs bufio.Writer.AvailableBuffer
+GO_MODULE = "module beezus\n\ngo 1.18\n"
 
-    file = Compiler(tree)
-    new_file_path = ".".join(file_path.split(".")[:-1]) + ".go"
-    with open(new_file_path, 'w') as compiled_file:
-        compiled_file.write(file.compile())
+class Session:
+    # What the programs compiled by one process share: the options, the
+    # compiled lexer, the modules parsed so far and the build cache. shared
+    # keeps parsed modules in memory even without the on-disk cache, stats
+    # records the phases of every compile and build.
+    def __init__(self, use_cache=True, jobs=None, shake=True, report=False, transforms=None, params=None,
+                 gofmt=False, lib_paths=(), shared=False, stats=None):
+        self.jobs = jobs
+        self.shake = shake
+        self.report = report
+        self.transforms = get_transforms(DEFAULT_LEVEL) if transforms is None else transforms
+        self.params = get_params() if params is None else params
+        self.gofmt = gofmt
+        self.cache_home = get_cache_home(BEEZUS_HOME)
+        self.fingerprint = compiler_fingerprint(BEEZUS_HOME)
+        disabled = [name for name in TRANSFORMS if name not in self.transforms]
+        if not shake: disabled.insert(0, "shake")
+        options = [f"no-{name}" for name in disabled] + [f"{name}={value}" for name, value in self.params.items()]
+        self.lib_paths = list(lib_paths)
+        options += [f"lib-path={path}" for path in get_library_paths(lib_paths)] # they change what imports find
+        self.cache = BuildCache(self.cache_home, self.fingerprint, " ".join(options))
+        self.use_cache = use_cache
+        self.shared = shared
+        self.stats = stats
+        self.tokenizer = None # compiled on the first program, a cached build never needs it
+        self.module_cache = None
+        self.index = None
 
-    os.system(f"gofmt -w {new_file_path}")
-    print(f"[RUNNING] go run {new_file_path}")
-    os.system(f"go run {new_file_path}")
-    # os.system(f"del {new_file_path}")
+    def start(self):
+        with open(GRAMMAR_PATH) as grammar_file:
+            token_grammar = grammar_file.read()
+        self.tokenizer = Tokenizer(token_grammar)
+        self.index = ModuleIndex(os.path.join(self.cache_home, INDEX_NAME) if self.use_cache else None)
+        if self.use_cache or self.shared:
+            version = compiler_version(self.fingerprint, token_grammar)
+            self.module_cache = SharedModuleCache(self.cache_home, version, persist=self.use_cache)
+
+    def phase(self, name):
+        return self.stats.phase(name) if self.stats is not None else nullcontext()
+
+    def compile(self, file_path, go_path):
+        # writes the Go of one program to go_path, returns the files its
+        # build depends on and the module paths that would shadow its imports
+        if self.tokenizer is None:
+            with self.phase("start"):
+                self.start()
+        transforms, params, shake = self.transforms, self.params, self.shake
+        program_home = os.path.dirname(get_program_home(file_path))
+        imports = dict()
+        resolver = ModuleResolver(get_search_paths(BEEZUS_HOME, program_home, self.lib_paths), self.index)
+        with self.phase("parse"), open_source(file_path) as program_source:
+            parser = Parser(self.tokenizer, BEEZUS_HOME, program_home, program_source, imports, self.module_cache,
+                            resolver=resolver)
+            declarations = parser.parse_module()
+        if self.stats is not None:
+            self.stats.count("tokens", parser.tokens.count)
+        with self.phase("modules"):
+            ModuleGraph(parser, self.jobs, self.stats).load(declarations)
+        with self.phase("link"):
+            parser.link_declarations(declarations)
+            self.index.save()
+        tree = parser.program
+
+        shaker = TreeShaker(tree, parser.parse_body)
+        with self.phase("shake"):
+            if shake:
+                shaker.run()
+            else:
+                for declaration in tree['body']:
+                    parser.parse_body(declaration)
+        inliner = Inliner(tree, params["inline-size"], params["inline-depth"])
+        if "inline-functions" in transforms:
+            with self.phase("inline-functions"):
+                inliner.run()
+        optimizer = Optimizer(tree, transforms)
+        with self.phase("optimize"):
+            optimizer.run()
+        if shake and (inliner.inlined or any(optimizer.eliminated.values())):
+            with self.phase("shake"):
+                shaker.run() # inlined or pruned calls may have been the last ones to a function
+        switches = SwitchLowering(tree)
+        if "lower-switches" in transforms:
+            with self.phase("lower-switches"):
+                switches.run()
+        builders = StringBuilders(tree)
+        if "string-builders" in transforms:
+            with self.phase("string-builders"):
+                builders.run()
+        invariants = LoopInvariants(tree)
+        if "hoist-invariants" in transforms:
+            with self.phase("hoist-invariants"):
+                invariants.run()
+        memoizer = Memoizer(tree, params["memo-size"])
+        if "memoize-recursion" in transforms:
+            with self.phase("memoize-recursion"):
+                memoizer.run()
+        specializer = BuiltinSpecializer(tree)
+        if "specialize-builtins" in transforms:
+            with self.phase("specialize-builtins"):
+                specializer.run()
+        if self.report:
+            if shake: print(shaker.report())
+            if "inline-functions" in transforms: print(inliner.report())
+            print(optimizer.report())
+            if "lower-switches" in transforms: print(switches.report())
+            if "string-builders" in transforms: print(builders.report())
+            if "hoist-invariants" in transforms: print(invariants.report())
+            if "memoize-recursion" in transforms: print(memoizer.report())
+            if "specialize-builtins" in transforms: print(specializer.report())
+        if tree is None:
+            raise LoomSyntaxError("Incomplete program file")
+
+        # import json
+        # tree['import'] = list(tree['import'])
+        # print(json.dumps(tree, indent=2))
+
+        file = Compiler(tree, self.jobs)
+        with self.phase("codegen"), open(go_path, 'w') as compiled_file:
+            file.compile(compiled_file)
+
+        if self.gofmt: # the output is already formatted, this only double checks it
+            with self.phase("gofmt"):
+                subprocess.run(["gofmt", "-w", go_path])
+
+        if self.stats is not None:
+            self.stats.program = tree
+            self.stats.count("tokens", parser.body_tokens) # bodies are lexed once more when parsed
+            self.stats.count("body tokens", parser.body_tokens)
+            self.stats.count("go bytes", os.path.getsize(go_path))
+            functions = [declaration for declaration in tree['body'] if declaration.type in
+                         {NodeType.FUNCTION_DECLARATION, NodeType.MEMO_DECLARATION, NodeType.PRINT_DECLARATION}]
+            self.stats.count("go functions", len(functions) + len(file.spawned) + file.string_hash)
+
+        dependencies = [file_path, GRAMMAR_PATH, DEFAULT_PATH] + list(imports.values())
+        missing = list()
+        for import_module, lib_path in imports.items():
+            for candidate in parser.get_import_candidates(import_module):
+                if candidate == lib_path: break
+                missing.append(candidate)
+        return dependencies, missing
+
+    def build(self, file_path, go_path, dependencies, missing):
+        # the cached binary of the program, None when go build fails
+        key = self.cache.get_key(dependencies)
+        binary_path = self.cache.get_binary_path(key)
+        os.makedirs(self.cache.bin_home, exist_ok=True)
+        print(f"[BUILDING] go build {go_path}")
+        with self.phase("go build"):
+            if subprocess.run(["go", "build", "-o", binary_path, go_path]).returncode != 0:
+                return None
+        with self.phase("cache store"):
+            self.cache.store(file_path, dependencies, missing, key)
+        return binary_path
+
+def main(file_path, use_cache=True, jobs=None, shake=True, report=False, transforms=None, params=None,
+         gofmt=False, lib_paths=(), stats=None):
+    session = Session(use_cache, jobs, shake, report, transforms, params, gofmt, lib_paths, stats=stats)
+    if stats is not None:
+        stats.start(file_path)
+
+    with session.phase("cache lookup"):
+        binary_path = session.cache.lookup(file_path) if use_cache else None
+    if binary_path is not None:
+        print(f"[CACHED] {file_path}")
+    else:
+        new_file_path = get_go_path(file_path)
+        dependencies, missing = session.compile(file_path, new_file_path)
+        binary_path = session.build(file_path, new_file_path, dependencies, missing)
+    if stats is not None:
+        stats.finish()
+        stats.report()
+    if binary_path is None:
+        return 1
+    return run_binary(binary_path)
+
+def watch(file_path, use_cache=True, jobs=None, shake=True, report=False, transforms=None, params=None,
+          gofmt=False, lib_paths=(), stats=None):
+    # Compiles, builds and starts the program, then again every time one of
+    # its files changes, until interrupted. The session lives on between
+    # rounds: the lexer is compiled once and only modules whose source
+    # changed are parsed again. A run still going when a file changes is
+    # stopped first.
+    session = Session(use_cache, jobs, shake, report, transforms, params, gofmt, lib_paths, shared=True,
+                      stats=stats)
+    go_path = get_go_path(file_path)
+    watched = [file_path, GRAMMAR_PATH, DEFAULT_PATH]
+    process = None
+    try:
+        while True:
+            started = time.perf_counter()
+            if stats is not None:
+                stats.start(file_path)
+            dependencies, missing, error = compile_program(session, file_path, go_path)
+            if error is not None:
+                print(f"[FAILED] {file_path}: {error}")
+            else:
+                watched = dependencies + missing # a new missing file would shadow an import
+                print(f"[COMPILED] {file_path} in {(time.perf_counter() - started) * 1000:.1f}ms")
+                binary_path = session.build(file_path, go_path, dependencies, missing)
+                if stats is not None:
+                    stats.finish()
+                    stats.report()
+                if binary_path is not None:
+                    print(f"[RUNNING] {binary_path}")
+                    process = subprocess.Popen([binary_path])
+            session.module_cache.collect()
+            changed = wait_for_change(watched, process)
+            stop_process(process)
+            process = None
+            if GRAMMAR_PATH in changed:
+                session.start()
+            else:
+                session.index.refresh()
+    except KeyboardInterrupt:
+        stop_process(process)
+        return 0
+
+def wait_for_change(paths, process=None):
+    # polls the files until one is created, removed or modified and returns
+    # those, reports the exit of the running program meanwhile
+    state = get_file_state(paths)
+    print(f"[WATCHING] {len(paths)} file(s)")
+    while True:
+        time.sleep(WATCH_INTERVAL)
+        if process is not None and process.poll() is not None:
+            print(f"[EXITED] {process.returncode}")
+            process = None
+        current = get_file_state(paths)
+        changed = [path for path in paths if current[path] != state[path]]
+        if changed:
+            return changed
+
+def get_file_state(paths):
+    state = dict()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            state[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            state[path] = None
+    return state
+
+def stop_process(process):
+    if process is not None and process.poll() is None:
+        process.terminate()
+        process.wait()
+
+batch_session = None # the Session of a batch worker process
+
+def start_batch_worker(options):
+    global batch_session
+    batch_session = Session(**options)
+
+def compile_batch_program(file_path, go_path):
+    # runs in a batch worker process
+    return compile_program(batch_session, file_path, go_path)
+
+def compile_program(session, file_path, go_path):
+    # (dependencies, missing, None) or (None, None, error message), one
+    # broken program must not stop the batch
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(go_path)), exist_ok=True)
+        dependencies, missing = session.compile(file_path, go_path)
+        return dependencies, missing, None
+    except Exception as error:
+        if os.path.exists(go_path):
+            os.remove(go_path) # a partial or older file would break the next go build
+        return None, None, str(error) or type(error).__name__
+
+def batch(patterns, go_module=None, use_cache=True, jobs=None, shake=True, report=False, transforms=None,
+          params=None, gofmt=False, lib_paths=()):
+    # Compiles every program the paths and globs name without running them.
+    # The programs are spread over worker processes, each compiles the lexer
+    # once and keeps the modules it parses for its next programs. Every
+    # program is built into the build cache, or with go_module written as
+    # one command of a Go module there and built by a single go build.
+    file_paths = get_batch_paths(patterns)
+    options = dict(use_cache=use_cache, jobs=1, shake=shake, report=report, transforms=transforms,
+                   params=params, gofmt=gofmt, lib_paths=lib_paths, shared=True)
+    session = Session(**options)
+    results = dict() # file path -> (status, detail)
+    pending = list()
+    for file_path in file_paths:
+        binary_path = session.cache.lookup(file_path) if use_cache and go_module is None else None
+        if binary_path is not None:
+            results[file_path] = ("CACHED", binary_path)
+        else:
+            pending.append(file_path)
+    go_paths = get_module_paths(pending, go_module) if go_module is not None \
+        else [get_go_path(file_path) for file_path in pending]
+
+    jobs = os.cpu_count() if jobs is None else jobs
+    if jobs <= 1 or len(pending) < 2:
+        compiled = [compile_program(session, file_path, go_path) for file_path, go_path in zip(pending, go_paths)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending)), initializer=start_batch_worker,
+                                 initargs=(options,)) as pool:
+            compiled = list(pool.map(compile_batch_program, pending, go_paths))
+
+    built = list()
+    for file_path, go_path, (dependencies, missing, error) in zip(pending, go_paths, compiled):
+        if error is not None:
+            results[file_path] = ("FAILED", error)
+        elif go_module is None:
+            binary_path = session.build(file_path, go_path, dependencies, missing)
+            results[file_path] = ("OK", binary_path) if binary_path is not None else ("FAILED", "go build failed")
+        else:
+            built.append((file_path, go_path))
+    if built:
+        results.update(build_module(go_module, built))
+
+    for file_path in file_paths:
+        status, detail = results[file_path]
+        print(f"[{status}] {file_path}: {detail}")
+    failed = sum(1 for status, _ in results.values() if status == "FAILED")
+    print(f"[BATCH] {len(file_paths) - failed} of {len(file_paths)} program(s) compiled")
+    return 1 if failed else 0
+
+def build_module(go_module, programs):
+    # programs are (file path, go path) pairs inside go_module, one go build
+    # compiles all of them into go_module/bin
+    with open(os.path.join(go_module, "go.mod"), "w") as go_mod:
+        go_mod.write(GO_MODULE)
+    bin_home = os.path.join(go_module, "bin")
+    packages = ["./" + os.path.basename(os.path.dirname(go_path)) for _, go_path in programs]
+    for package in packages:
+        binary_path = os.path.join(bin_home, package[2:])
+        if os.path.exists(binary_path):
+            os.remove(binary_path)
+    print(f"[BUILDING] go build {len(packages)} command(s) in {go_module}")
+    subprocess.run(["go", "build", "-o", bin_home + os.sep] + packages, cwd=go_module)
+    results = dict()
+    for (file_path, _), package in zip(programs, packages):
+        binary_path = os.path.join(bin_home, package[2:])
+        results[file_path] = ("OK", binary_path) if os.path.exists(binary_path) else ("FAILED", "go build failed")
+    return results
+
+def get_batch_paths(patterns):
+    # the programs of paths and globs, in order and without repeats
+    file_paths = list()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        file_paths.extend([path for path in matches if path not in file_paths])
+    return file_paths
+
+def get_module_paths(file_paths, go_module):
+    # go_module/<name>/main.go for every program, go build names the
+    # command after its directory
+    go_paths = list()
+    names = set()
+    for file_path in file_paths:
+        relative_path = os.path.relpath(os.path.splitext(os.path.abspath(file_path))[0])
+        base_name = re.sub(r"\W+", "_", relative_path).strip("_") or "program"
+        name, index = base_name, 1
+        while name in names or name == "bin":
+            index += 1
+            name = f"{base_name}_{index}"
+        names.add(name)
+        go_paths.append(os.path.join(go_module, name, "main.go"))
+    return go_paths
+
+def get_go_path(file_path):
+    return ".".join(file_path.split(".")[:-1]) + ".go"
+
+def run_binary(binary_path):
+    print(f"[RUNNING] {binary_path}")
+    return subprocess.run([binary_path]).returncode
 
 def get_program_home(input_path):
     if os.path.isabs(input_path):
@@ -40,4 +414,57 @@ def get_program_home(input_path):
     return os.path.abspath(os.path.join(os.getcwd(), input_path))
 
 if __name__ == '__main__':
-    main("examples/rule110.bz")
+    arg_parser = argparse.ArgumentParser(description="Beezus Script compiler")
+    arg_parser.add_argument("files", nargs="*", default=["examples/rule110.bz"], metavar="file",
+                            help="the program to compile and run, or with --batch programs and globs")
+    arg_parser.add_argument("--batch", action="store_true",
+                            help="compile every program given without running them")
+    arg_parser.add_argument("--go-module", metavar="DIR", default=None,
+                            help="batch: write the programs as commands of one Go module in DIR and build "
+                                 "them with a single go build")
+    arg_parser.add_argument("--watch", action="store_true",
+                            help="rebuild and rerun the program whenever one of its files changes")
+    arg_parser.add_argument("--lib-path", dest="lib_paths", action="append", default=[], metavar="DIR",
+                            help="also look for imported modules in DIR, ahead of BEEZUS_PATH and libs/")
+    arg_parser.add_argument("--no-cache", action="store_true",
+                            help="always regenerate and rebuild the program")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=None,
+                            help="worker processes used to parse imported modules and generate Go, "
+                                 "or to compile the programs of a batch")
+    arg_parser.add_argument("--no-shake", action="store_true",
+                            help="keep (and parse) functions main can not reach")
+    arg_parser.add_argument("--report", action="store_true",
+                            help="print what the optimisation passes changed")
+    arg_parser.add_argument("--gofmt", action="store_true",
+                            help="run gofmt over the generated Go file")
+    arg_parser.add_argument("--timings", action="store_true",
+                            help="print the wall and CPU time of every compile phase and imported module, "
+                                 "with token, AST node and generated Go counts")
+    arg_parser.add_argument("--stats", action="store_true",
+                            help="--timings with the peak memory of the compile (traced, slows it down)")
+    arg_parser.add_argument("--timings-file", metavar="FILE", default=None,
+                            help="write the timings as JSON to FILE, - for stdout")
+    arg_parser.add_argument("-O", dest="level", type=int, choices=range(3), default=DEFAULT_LEVEL,
+                            help=f"optimisation level (default {DEFAULT_LEVEL})")
+    arg_parser.add_argument("-f", dest="flags", action="append", default=[], metavar="[no-]NAME",
+                            help="enable or disable one optimisation: " + ", ".join(TRANSFORMS))
+    arg_parser.add_argument("--param", dest="params", action="append", default=[], metavar="NAME=VALUE",
+                            help="tune a limit of the optimisations: " + ", ".join(PARAMS))
+    args = arg_parser.parse_args()
+    try:
+        transforms = get_transforms(args.level, args.flags)
+        params = get_params(args.params)
+    except ValueError as error:
+        arg_parser.error(str(error))
+    options = dict(use_cache=not args.no_cache, jobs=args.jobs, shake=not args.no_shake, report=args.report,
+                   transforms=transforms, params=params, gofmt=args.gofmt, lib_paths=args.lib_paths)
+    timings = args.timings or args.stats or args.timings_file is not None
+    if args.batch or args.go_module is not None or len(args.files) > 1:
+        if args.watch:
+            arg_parser.error("--watch takes a single program")
+        if timings:
+            arg_parser.error("--timings, --stats and --timings-file take a single program")
+        sys.exit(batch(args.files, args.go_module, **options))
+    if timings:
+        options["stats"] = Stats(args.stats, args.timings or args.stats, args.timings_file)
+    sys.exit((watch if args.watch else main)(args.files[0], **options))